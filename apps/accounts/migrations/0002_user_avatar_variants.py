@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
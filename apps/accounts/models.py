@@ -1,11 +1,14 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 
+from apps.core.images import schedule_variants
+
 class User(AbstractUser):
     email = models.EmailField(unique=True)
     first_name = models.CharField(max_length=30, blank=True)
     last_name = models.CharField(max_length=30, blank=True)
     avatar = models.ImageField(upload_to='avatars/', blank=True)
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
     bio = models.TextField(blank=True, max_length=500)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -22,6 +25,14 @@ class User(AbstractUser):
     def __str__(self):
         return self.email
 
+    def save(self, *args, **kwargs):
+        avatar_loaded = 'avatar' not in self.get_deferred_fields()
+        if avatar_loaded and not self.avatar and self.avatar_variants:
+            self.avatar_variants = {}
+        super().save(*args, **kwargs)
+        if avatar_loaded:
+            schedule_variants(self, 'avatar', 'avatar_variants')
+
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}".strip()
\ No newline at end of file
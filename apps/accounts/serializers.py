@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
+
+from apps.core.images import variant_urls
 from .models import User
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -58,15 +60,19 @@ class UserProfileSerializer(serializers.ModelSerializer):
     full_name = serializers.ReadOnlyField()
     posts_count = serializers.SerializerMethodField()
     comments_count = serializers.SerializerMethodField()
+    avatar_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name',
-                  'full_name', 'avatar', 'bio', 'created_at', 'updated_at',
+                  'full_name', 'avatar', 'avatar_variants', 'bio', 'created_at', 'updated_at',
                     'posts_count', 'comments_count']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
+    def get_avatar_variants(self, obj):
+        return variant_urls(obj.avatar, obj.avatar_variants, self.context.get('request'))
+
     def get_posts_count(self, obj):
         try:
             return obj.posts.count()
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from .models import Comment
+from apps.core.cache import INVALIDATED_BY, bump_versions_on_commit
+from apps.main.models import Post
 
 
 @admin.register(Comment)
@@ -50,14 +52,21 @@ class CommentAdmin(admin.ModelAdmin):
 
     actions = ['make_active', 'make_inactive']
 
+    def _set_active(self, queryset, is_active):
+        post_ids = set(queryset.values_list('post_id', flat=True))
+        updated = queryset.update(is_active=is_active)
+        Post.recount_comments(post_ids)
+        bump_versions_on_commit(*INVALIDATED_BY['comments.Comment'])
+        return updated
+
     def make_active(self, request, queryset):
-        updated = queryset.update(is_active=True)
+        updated = self._set_active(queryset, True)
         self.message_user(request, f'{updated} comments were marked as active.')
 
     make_active.short_description = "Mark selected comments as active"
 
     def make_inactive(self, request, queryset):
-        updated = queryset.update(is_active=False)
+        updated = self._set_active(queryset, False)
         self.message_user(request, f'{updated} comments were marked as inactive.')
 
     make_inactive.short_description = "Mark selected comments as inactive"
\ No newline at end of file
@@ -0,0 +1,66 @@
+from django.http import Http404
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.http import require_safe
+
+from apps.core.async_views import async_api_view, json_response
+from apps.core.pagination import KeysetPagination
+from apps.main.models import Post
+from .models import Comment
+from .serializers import CommentDetailValuesSerializer, CommentValuesSerializer
+
+# Async twins of post_comments and comment_replies, see
+# apps/main/async_views.py.
+
+
+@require_safe
+@async_api_view
+async def post_comments(request, post_id):
+    post = await aget_object_or_404(
+        Post.objects.only('id', 'title', 'slug', 'comments_count'), pk=post_id, status='published'
+    )
+
+    serializer = CommentDetailValuesSerializer(context={'request': request})
+    comments = serializer.values(Comment.objects.filter(post=post,
+                                                        is_active=True,
+                                                        parent = None)
+                                 ).order_by('-created_at')
+
+    paginator = None
+    if KeysetPagination.cursor_query_param in request.GET:
+        paginator = KeysetPagination()
+        rows = await paginator.apaginate_queryset(comments, request)
+    else:
+        rows = [row async for row in comments]
+
+    data = {
+        'post': {
+            'id': post.id,
+            'title': post.title,
+            'slug': post.slug,
+        },
+        'comments': await serializer.amany(rows),
+        'comments_count': post.comments_count
+    }
+    if paginator is not None:
+        data['next'] = paginator.get_next_link()
+    return json_response(data)
+
+
+@require_safe
+@async_api_view
+async def comment_replies(request, comment_id):
+    serializer = CommentValuesSerializer(context={'request': request})
+    parent_comment = await serializer.values(
+        Comment.objects.filter(id=comment_id, is_active=True)
+    ).afirst()
+    if parent_comment is None:
+        raise Http404('No Comment matches the given query.')
+
+    replies = serializer.many([row async for row in serializer.values(
+        Comment.objects.filter(parent_id=comment_id, is_active=True).order_by('created_at')
+    )])
+    return json_response({
+        'parent_comment': serializer.to_representation(parent_comment),
+        'replies': replies,
+        'replies_count': len(replies)
+    })
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+
+from apps.main.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Recalculate Post.comments_count from active comments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('post_ids', nargs='*', type=int)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options['post_ids']:
+            updated = Post.recount_comments(options['post_ids'])
+            self.stdout.write(self.style.SUCCESS(f'Recounted {updated} posts'))
+            return
+
+        batch_size = options['batch_size']
+        last_id = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        updated = 0
+        for start in range(0, last_id, batch_size):
+            ids = Post.objects.filter(pk__gt=start, pk__lte=start + batch_size).values('pk')
+            updated += Post.recount_comments(ids)
+        self.stdout.write(self.style.SUCCESS(f'Recounted {updated} posts'))
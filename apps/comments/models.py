@@ -1,7 +1,16 @@
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.conf import settings
 
 
+class CommentQuerySet(models.QuerySet):
+    def with_replies_count(self):
+        active = (Comment.objects.filter(parent=OuterRef('pk'), is_active=True)
+                  .order_by().values('parent').annotate(total=Count('pk')).values('total'))
+        return self.annotate(active_replies_count=Coalesce(Subquery(active), 0))
+
+
 class Comment(models.Model):
     post = models.ForeignKey('main.Post', on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='comments')
@@ -13,6 +22,8 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
         db_table = 'comments'
         verbose_name = 'Comment'
@@ -27,6 +38,16 @@ class Comment(models.Model):
     def __str__(self):
         return f'Comment by {self.author.username} on {self.post.title}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the row looked like so signals can work out how
+        # Post.comments_count changes on save.
+        loaded = dict(zip(field_names, values))
+        if 'post_id' in loaded and 'is_active' in loaded:
+            instance._loaded_counter_state = (loaded['post_id'], loaded['is_active'])
+        return instance
+
     @property
     def replies_count(self):
         return self.replies.filter(is_active=True).count()
@@ -1,13 +1,28 @@
 from lib2to3.fixes.fix_input import context
 
 from rest_framework import serializers
+
+from apps.accounts.models import User
+from apps.core.images import variant_urls
+from apps.core.serializers import SparseFieldsMixin, ValuesSerializer
 from .models import Comment
 from apps.main.models import Post
 
-class CommentSerializer(serializers.ModelSerializer):
+def reply_fields(selected, all_fields):
+    # Replies show the same keys as their parent, or all of them when
+    # ?fields= asked for nothing but the replies.
+    return [name for name in all_fields if name in selected and name != 'replies'] or list(all_fields)
+
+
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author_info = serializers.SerializerMethodField()
     replies_count = serializers.ReadOnlyField()
     is_reply = serializers.ReadOnlyField()
+    field_dependencies = {
+        'author_info': ('author',),
+        'replies_count': (),
+        'is_reply': ('parent',),
+    }
 
     class Meta:
         model = Comment
@@ -25,8 +40,95 @@ class CommentSerializer(serializers.ModelSerializer):
             'username': obj.author.username,
             'full_name': obj.author.full_name,
             'avatar': obj.author.avatar.url if obj.author.avatar else None,
+            'avatar_variants': variant_urls(obj.author.avatar, obj.author.avatar_variants),
+        }
+
+class CommentValuesSerializer(ValuesSerializer):
+    # values() twin of CommentSerializer; values() adds the
+    # with_replies_count() annotation when replies_count is shown.
+    fields = (
+        ('id', 'id'),
+        ('content', 'content'),
+        ('author', 'author_id'),
+        ('author_info', 'author_id'),
+        ('parent', 'parent_id'),
+        ('is_active', 'is_active'),
+        ('replies_count', 'active_replies_count'),
+        ('is_reply', 'parent_id', lambda parent_id: parent_id is not None),
+        ('created_at', 'created_at', 'to_datetime'),
+        ('updated_at', 'updated_at', 'to_datetime'),
+    )
+    format_lookups = {
+        'author_info': (
+            'author__username', 'author__first_name', 'author__last_name',
+            'author__avatar', 'author__avatar_variants',
+        ),
+    }
+    avatar_field = User._meta.get_field('avatar')
+
+    def format_author_info(self, row):
+        return {
+            'id': row['author_id'],
+            'username': row['author__username'],
+            'full_name': f"{row['author__first_name']} {row['author__last_name']}".strip(),
+            'avatar': self.file_url(self.avatar_field, row['author__avatar'], absolute=False),
+            'avatar_variants': self.file_variants(
+                self.avatar_field, row['author__avatar'], row['author__avatar_variants'], absolute=False,
+            ),
         }
 
+    def values(self, queryset):
+        if 'replies_count' in self.selected:
+            queryset = queryset.with_replies_count()
+        return super().values(queryset)
+
+
+class CommentDetailValuesSerializer(CommentValuesSerializer):
+    # Adds the active replies of top-level comments, fetched for the whole
+    # page in one query instead of one per comment, unless ?fields= leaves
+    # them out.
+    computed_fields = ('replies',)
+    extra_lookups = ('id', 'parent_id')
+
+    def __init__(self, context=None, selected=None):
+        super().__init__(context, selected)
+        if 'replies' in self.selected:
+            self.replies_serializer = type(self)(self.context, selected=reply_fields(
+                self.selected, [field[0] for field in self.fields]
+            ))
+
+    def replies_queryset(self, rows):
+        parent_ids = [row['id'] for row in rows if row['parent_id'] is None]
+        return self.replies_serializer.values(
+            Comment.objects.filter(parent_id__in=parent_ids, is_active=True).order_by('created_at')
+        )
+
+    def attach_replies(self, rows, data, reply_rows):
+        replies = {}
+        for row, reply in zip(reply_rows, self.replies_serializer.many(reply_rows)):
+            replies.setdefault(row['parent_id'], []).append(reply)
+        for row, item in zip(rows, data):
+            item['replies'] = replies.get(row['id'], []) if row['parent_id'] is None else []
+        return data
+
+    def many(self, rows):
+        rows = list(rows)
+        data = super().many(rows)
+        if 'replies' not in self.selected:
+            return data
+        if not any(row['parent_id'] is None for row in rows):
+            return self.attach_replies(rows, data, [])
+        return self.attach_replies(rows, data, list(self.replies_queryset(rows)))
+
+    async def amany(self, rows):
+        data = super().many(rows)
+        if 'replies' not in self.selected:
+            return data
+        if not any(row['parent_id'] is None for row in rows):
+            return self.attach_replies(rows, data, [])
+        return self.attach_replies(rows, data, [row async for row in self.replies_queryset(rows)])
+
+
 class CommentCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Comment
@@ -63,14 +165,21 @@ class CommentUpdateSerializer(serializers.ModelSerializer):
 
 class CommentDetailSerializer(CommentSerializer):
     replies = serializers.SerializerMethodField()
+    field_dependencies = {**CommentSerializer.field_dependencies, 'replies': ('parent',)}
 
     class Meta(CommentSerializer.Meta):
         fields = CommentSerializer.Meta.fields + ['replies']\
 
     def get_replies(self, obj):
         if obj.parent is None:
+            context = self.context
+            if self.sparse:
+                context = {**context, 'sparse_fields': reply_fields(self.fields, CommentSerializer.Meta.fields)}
+            serializer = CommentSerializer(many=True, context=context)
+            # The reverse manager reads parent_id to attach obj to each reply.
             replies = obj.replies.filter(is_active=True).order_by('created_at')
-            return CommentSerializer(replies, many=True, context=self.context).data
+            serializer.instance = serializer.child.narrow(replies, ('parent',))
+            return serializer.data
         return []
 
 
@@ -0,0 +1,35 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.main.models import Post
+from .models import Comment
+
+
+@receiver(post_save, sender=Comment)
+def update_comments_count_on_save(sender, instance, created, **kwargs):
+    new_state = (instance.post_id, instance.is_active)
+    if created:
+        old_state = (None, False)
+    elif hasattr(instance, '_loaded_counter_state'):
+        old_state = instance._loaded_counter_state
+    else:
+        # Instance was not loaded with post/is_active, so there is no
+        # previous state to diff against.
+        Post.recount_comments([instance.post_id])
+        instance._loaded_counter_state = new_state
+        return
+
+    if old_state != new_state:
+        with transaction.atomic():
+            if old_state[1]:
+                Post.adjust_comments_count(old_state[0], -1)
+            if new_state[1]:
+                Post.adjust_comments_count(new_state[0], 1)
+    instance._loaded_counter_state = new_state
+
+
+@receiver(post_delete, sender=Comment)
+def update_comments_count_on_delete(sender, instance, **kwargs):
+    if instance.is_active:
+        Post.adjust_comments_count(instance.post_id, -1)
@@ -1,3 +1,132 @@
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from apps.accounts.models import User
+from apps.main.models import Post
+from .models import Comment
+
+
+def create_user(username, **extra):
+    return User.objects.create_user(email=f'{username}@example.com', username=username, password='pass', **extra)
+
+
+class CommentsCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = create_user('author')
+        self.post = Post.objects.create(title='Post', content='body', author=self.author)
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def comments_count(self):
+        self.post.refresh_from_db()
+        return self.post.comments_count
+
+    def test_create_and_soft_delete(self):
+        response = self.client.post('/api/v1/comments/', {'post': self.post.pk, 'content': 'first'})
+        self.assertEqual(response.status_code, 201)
+        comment = Comment.objects.get()
+        self.client.post('/api/v1/comments/', {'post': self.post.pk, 'parent': comment.pk, 'content': 'reply'})
+        self.assertEqual(self.comments_count(), 2)
+
+        response = self.client.delete(f'/api/v1/comments/{comment.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.comments_count(), 1)
+
+    def test_hard_delete_of_active_comment(self):
+        comment = Comment.objects.create(post=self.post, author=self.author, content='gone')
+        self.assertEqual(self.comments_count(), 1)
+        comment.delete()
+        self.assertEqual(self.comments_count(), 0)
+
+    def test_admin_toggles(self):
+        comments = [Comment.objects.create(post=self.post, author=self.author, content=str(i)) for i in range(3)]
+        admin = create_user('admin', is_staff=True, is_superuser=True)
+        self.client.force_login(admin)
+        changelist = '/admin/comments/comment/'
+
+        self.client.post(changelist, {
+            'action': 'make_inactive', '_selected_action': [comment.pk for comment in comments[:2]],
+        })
+        self.assertEqual(self.comments_count(), 1)
+
+        self.client.post(changelist, {'action': 'make_active', '_selected_action': [comments[0].pk]})
+        self.assertEqual(self.comments_count(), 2)
+
+        comment = Comment.objects.get(pk=comments[2].pk)
+        comment.is_active = False
+        comment.save()
+        self.assertEqual(self.comments_count(), 1)
+
+
+class ConditionalCommentDetailTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = create_user('author')
+        self.post = Post.objects.create(title='Post', content='body', author=self.author)
+        self.comment = Comment.objects.create(post=self.post, author=self.author, content='top')
+        self.url = f'/api/v1/comments/{self.comment.pk}/'
+        self.client = APIClient()
+
+    def test_new_reply_changes_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Comment.objects.create(post=self.post, author=self.author, parent=self.comment, content='reply')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['replies']), 1)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class SparseCommentFieldsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = create_user('author')
+        self.post = Post.objects.create(title='Post', content='body', author=self.author)
+        self.comment = Comment.objects.create(post=self.post, author=self.author, content='top')
+        self.reply = Comment.objects.create(post=self.post, author=self.author, parent=self.comment, content='reply')
+        self.client = APIClient()
+
+    def test_replies_only_keeps_full_reply_fields(self):
+        urls = [f'/api/v1/comments/{self.comment.pk}/', f'/api/v1/comments/post/{self.post.pk}/']
+        for url in urls:
+            response = self.client.get(url, {'fields': 'replies'})
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            comment = data['comments'][0] if 'comments' in data else data
+            self.assertEqual(list(comment), ['replies'])
+            self.assertEqual(comment['replies'][0]['id'], self.reply.pk)
+            self.assertEqual(comment['replies'][0]['content'], 'reply')
+
+    def test_replies_follow_the_parent_fields(self):
+        response = self.client.get(f'/api/v1/comments/post/{self.post.pk}/', {'fields': 'id,replies'})
+        self.assertEqual(response.json()['comments'], [{'id': self.comment.pk, 'replies': [{'id': self.reply.pk}]}])
+
+    def test_excluding_replies_skips_their_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/v1/comments/{self.comment.pk}/', {'exclude': 'replies,replies_count'})
+
+        self.assertNotIn('replies', response.json())
+        # The comment itself and the ETag validator; no reply fetch or counts.
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('COUNT(*)', ' '.join(query['sql'] for query in queries.captured_queries))
+
+    def test_fields_with_cursor(self):
+        for index in range(25):
+            Comment.objects.create(post=self.post, author=self.author, content=str(index))
+        for url in ['/api/v1/comments/', f'/api/v1/comments/post/{self.post.pk}/']:
+            response = self.client.get(url, {'cursor': '', 'fields': 'content'})
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            comments = data['results'] if 'results' in data else data['comments']
+            self.assertEqual(list(comments[0]), ['content'])
+            self.assertIsNotNone(data['next'])
+            self.assertEqual(self.client.get(data['next']).status_code, 200)
+
+    def test_unknown_field(self):
+        response = self.client.get(f'/api/v1/comments/{self.comment.pk}/', {'fields': 'id,bogus'})
+        self.assertEqual(response.status_code, 400)
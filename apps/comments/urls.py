@@ -1,10 +1,14 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+read_views = async_views if settings.ASYNC_READ_VIEWS else views
 
 urlpatterns = [
     path('', views.CommentListCreateView.as_view(), name='comment-list'),
     path('<int:pk>/', views.CommentDetailView.as_view(), name='comment-detail'),
     path('my-comments/', views.MyCommentsView.as_view(), name='my-comments'),
-    path('post/<int:post_id>/', views.post_comments, name='post-comments'),
-    path('<int:comment_id>/replies/', views.comment_replies, name='comment-replies'),
+    path('export/', views.export_comments, name='comment-export'),
+    path('post/<int:post_id>/', read_views.post_comments, name='post-comments'),
+    path('<int:comment_id>/replies/', read_views.comment_replies, name='comment-replies'),
 ]
\ No newline at end of file
@@ -2,6 +2,8 @@ from rest_framework import generics, permissions, filters
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
+from django.db.models import Count, Max
 from django.shortcuts import get_object_or_404
 
 from .models import Comment
@@ -9,15 +11,24 @@ from .serializers import (
     CommentSerializer,
     CommentCreateSerializer,
     CommentUpdateSerializer,
-    CommentDetailSerializer
+    CommentDetailSerializer,
+    CommentValuesSerializer,
+    CommentDetailValuesSerializer,
 )
 from .permissions import IsAuthorOrReadOnly
+from apps.core.conditional import ConditionalRetrieveMixin
+from apps.core.db import AtomicWritesMixin, atomic_writes
+from apps.core.export import export_response
+from apps.core.pagination import KeysetPagination, OptionalCursorPagination
+from apps.core.serializers import SparseQuerysetMixin, ValuesListMixin
 from apps.main.models import Post
 
 
 
-class CommentListCreateView(generics.ListCreateAPIView):
+class CommentListCreateView(AtomicWritesMixin, ValuesListMixin, generics.ListCreateAPIView):
+    values_serializer_class = CommentValuesSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = OptionalCursorPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['post', 'author', 'parent']
     search_fields = ['content']
@@ -33,22 +44,45 @@ class CommentListCreateView(generics.ListCreateAPIView):
         return Comment.objects.filter(is_active=True).select_related('author', 'post', 'parent')
 
 
-class CommentDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CommentDetailView(AtomicWritesMixin, ConditionalRetrieveMixin, SparseQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Comment.objects.filter(is_active=True).select_related('author', 'post')
     serializer_class = CommentDetailSerializer
     permission_classes = [IsAuthorOrReadOnly]
+    sparse_required_fields = ('updated_at',)
 
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
             return CommentUpdateSerializer
         return CommentDetailSerializer
 
+    def get_last_modified(self, instance):
+        # Top-level comments embed their active replies, so a new or edited
+        # reply has to change the validators as well.
+        if not hasattr(instance, '_replies_state'):
+            instance._replies_state = instance.replies.filter(is_active=True).aggregate(
+                total=Count('pk'), last=Max('updated_at')
+            )
+        last = instance._replies_state['last']
+        return max(instance.updated_at, last) if last else instance.updated_at
+
+    def get_etag_parts(self, instance):
+        return super().get_etag_parts(instance) + [instance._replies_state['total']]
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        not_modified = self.get_not_modified_response(request, instance)
+        if not_modified is not None:
+            return not_modified
+        serializer = self.get_serializer(instance)
+        return self.finalize_conditional_response(Response(serializer.data), instance)
+
     def perform_destroy(self, instance):
         instance.is_active = False
         instance.save()
 
-class MyCommentsView(generics.ListAPIView):
+class MyCommentsView(ValuesListMixin, generics.ListAPIView):
     serializer_class = CommentSerializer
+    values_serializer_class = CommentValuesSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['post', 'parent', 'is_active']
@@ -60,38 +94,61 @@ class MyCommentsView(generics.ListAPIView):
         return Comment.objects.filter(is_active=True).select_related('post', 'parent')
 
 
+@atomic_writes
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def post_comments(request, post_id):
     post = get_object_or_404(Post, pk=post_id, status='published')
 
-    comments = (Comment.objects.filter(post=post,
-                                      is_active=True,
-                                      parent = None)
-                .select_related('author'
-                ).prefetch_related('replies__author')
-                ).order_by('-created_at')
-
-    serializer = CommentDetailSerializer(comments, many=True, context={'request': request})
-    return Response({
+    serializer = CommentDetailValuesSerializer(context={'request': request})
+    comments = serializer.values(Comment.objects.filter(post=post,
+                                                        is_active=True,
+                                                        parent = None)
+                                 ).order_by('-created_at')
+
+    paginator = None
+    if KeysetPagination.cursor_query_param in request.query_params:
+        paginator = KeysetPagination()
+        comments = paginator.paginate_queryset(comments, request)
+    data = {
         'post': {
             'id': post.id,
             'title': post.title,
             'slug': post.slug,
         },
-        'comments': serializer.data,
-        'comments_count': post.comments.filter(is_active=True).count()
-    })
-
+        'comments': serializer.many(comments),
+        'comments_count': post.comments_count
+    }
+    if paginator is not None:
+        data['next'] = paginator.get_next_link()
+    return Response(data)
+
+@atomic_writes
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def comment_replies(request, comment_id):
     parent_comment = get_object_or_404(Comment, id=comment_id, is_active=True)
-    replies = Comment.objects.filter(parent=parent_comment, is_active=True).select_related('author').order_by('created_at')
-    serializer = CommentSerializer(replies, many=True, context={'request': request})
+    serializer = CommentValuesSerializer(context={'request': request})
+    replies = serializer.many(serializer.values(
+        Comment.objects.filter(parent=parent_comment, is_active=True).order_by('created_at')
+    ))
     return Response({
         'parent_comment': CommentSerializer(parent_comment, context={'request': request}).data,
-        'replies': serializer.data,
-        'replies_count': replies.count()
+        'replies': replies,
+        'replies_count': len(replies)
     })
 
+
+EXPORT_FIELDS = (
+    'id', 'post_id', 'post__slug', 'parent_id', 'author__username',
+    'content', 'is_active', 'created_at', 'updated_at',
+)
+
+@transaction.non_atomic_requests
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def export_comments(request):
+    comments = Comment.objects.all()
+    if request.query_params.get('post'):
+        comments = comments.filter(post_id=request.query_params['post'])
+    return export_response(request, comments, EXPORT_FIELDS, 'comments')
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.core'
+
+    def ready(self):
+        from .signals import connect_cache_invalidation
+        from .timing import install_instrumentation
+        connect_cache_invalidation()
+        install_instrumentation()
@@ -0,0 +1,185 @@
+import hashlib
+import time
+from functools import partial, wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+# Cached responses are keyed on the version of every group they depend on.
+# Saving or deleting one of these models bumps the versions, which orphans
+# the old entries instead of having to find and delete them.
+INVALIDATED_BY = {
+    'main.Post': ('posts', 'categories'),
+    'main.Category': ('posts', 'categories'),
+    'comments.Comment': ('posts',),
+    'subscribe.SubscriptionPlan': ('plans',),
+}
+
+OUTCOMES = ('hit', 'stale', 'miss')
+registered_views = set()
+
+
+def _version_key(group):
+    return f'respcache:version:{group}'
+
+
+def _stats_key(name, outcome):
+    return f'respcache:stats:{name}:{outcome}'
+
+
+def _incr(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key)
+
+
+def get_versions(groups):
+    keys = [_version_key(group) for group in groups]
+    versions = cache.get_many(keys)
+    return [versions.get(key, 0) for key in keys]
+
+
+def bump_versions(*groups):
+    for group in groups:
+        _incr(_version_key(group))
+
+
+def bump_versions_on_commit(*groups):
+    # Bumping inside the writing transaction would let a concurrent read
+    # cache the old rows under the new version; outside a transaction this
+    # bumps straight away.
+    transaction.on_commit(partial(bump_versions, *groups))
+
+
+def get_stats():
+    keys = {
+        _stats_key(name, outcome): (name, outcome)
+        for name in registered_views for outcome in OUTCOMES
+    }
+    values = cache.get_many(keys)
+    stats = {name: dict.fromkeys(OUTCOMES, 0) for name in registered_views}
+    for key, (name, outcome) in keys.items():
+        stats[name][outcome] = values.get(key, 0)
+    return stats
+
+
+def _is_cacheable(request):
+    return request.method == 'GET' and not request.user.is_authenticated
+
+
+def _respond(entry, outcome, name):
+    _incr(_stats_key(name, outcome))
+    response = Response(entry['data'], status=entry['status'])
+    response['X-Cache'] = outcome.upper()
+    return response
+
+
+def cached_call(request, name, groups, build):
+    if not _is_cacheable(request):
+        return build()
+
+    versions = '.'.join(str(version) for version in get_versions(groups))
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    key = f'respcache:{name}:{versions}:{path}'
+    lock_key = f'{key}:lock'
+
+    entry = cache.get(key)
+    if entry is not None and entry['fresh_until'] > time.time():
+        return _respond(entry, 'hit', name)
+
+    # Only the worker that wins the lock rebuilds; the rest serve the
+    # stale copy or briefly wait for the winner, and build without the
+    # lock (leaving the winner's in place) if it is too slow.
+    acquired = cache.add(lock_key, 1, timeout=settings.RESPONSE_CACHE_LOCK_TIMEOUT)
+    if not acquired:
+        if entry is not None:
+            return _respond(entry, 'stale', name)
+        deadline = time.time() + settings.RESPONSE_CACHE_LOCK_WAIT
+        while time.time() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry is not None:
+                return _respond(entry, 'hit', name)
+
+    try:
+        response = build()
+        if response.status_code == 200:
+            cache.set(key, {
+                'data': response.data,
+                'status': response.status_code,
+                'fresh_until': time.time() + settings.RESPONSE_CACHE_TIMEOUT,
+            }, timeout=settings.RESPONSE_CACHE_TIMEOUT + settings.RESPONSE_CACHE_STALE_TIMEOUT)
+    finally:
+        if acquired:
+            cache.delete(lock_key)
+    _incr(_stats_key(name, 'miss'))
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+async def _aincr(key):
+    try:
+        return await cache.aincr(key)
+    except ValueError:
+        await cache.aadd(key, 0, timeout=None)
+        return await cache.aincr(key)
+
+
+async def acached_data(request, name, groups, build):
+    # Async views share the keys, versions and stats of cached_call but
+    # skip the rebuild lock; `build` is a coroutine function returning the
+    # response data. Requests carrying credentials are never cached.
+    user = await request.auser()
+    if request.method != 'GET' or user.is_authenticated or 'HTTP_AUTHORIZATION' in request.META:
+        return await build(), None
+
+    keys = [_version_key(group) for group in groups]
+    versions = await cache.aget_many(keys)
+    versions = '.'.join(str(versions.get(key, 0)) for key in keys)
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    key = f'respcache:{name}:{versions}:{path}'
+
+    entry = await cache.aget(key)
+    if entry is not None and entry['fresh_until'] > time.time():
+        await _aincr(_stats_key(name, 'hit'))
+        return entry['data'], 'hit'
+
+    data = await build()
+    await cache.aset(key, {
+        'data': data,
+        'status': 200,
+        'fresh_until': time.time() + settings.RESPONSE_CACHE_TIMEOUT,
+    }, timeout=settings.RESPONSE_CACHE_TIMEOUT + settings.RESPONSE_CACHE_STALE_TIMEOUT)
+    await _aincr(_stats_key(name, 'miss'))
+    return data, 'miss'
+
+
+def cache_response(*groups):
+    def decorator(view_func):
+        name = f'{view_func.__module__}.{view_func.__name__}'
+        registered_views.add(name)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            return cached_call(request, name, groups, lambda: view_func(request, *args, **kwargs))
+        return wrapper
+    return decorator
+
+
+class CachedListMixin:
+    cache_groups = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        registered_views.add(f'{cls.__module__}.{cls.__name__}')
+
+    def list(self, request, *args, **kwargs):
+        name = f'{type(self).__module__}.{type(self).__name__}'
+        return cached_call(
+            request, name, self.cache_groups,
+            lambda: super(CachedListMixin, self).list(request, *args, **kwargs),
+        )
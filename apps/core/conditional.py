@@ -0,0 +1,34 @@
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalRetrieveMixin:
+    # Answers If-None-Match / If-Modified-Since with 304 before the object
+    # is serialized. Views override get_etag_parts() when the body depends
+    # on more than the row's updated_at.
+
+    def get_last_modified(self, instance):
+        return instance.updated_at
+
+    def get_etag_parts(self, instance):
+        return [instance.pk, self.get_last_modified(instance).timestamp()]
+
+    def get_validators(self, instance):
+        etag = quote_etag('-'.join(str(part) for part in self.get_etag_parts(instance)))
+        last_modified = int(self.get_last_modified(instance).timestamp())
+        return etag, last_modified
+
+    def set_validators(self, response, etag, last_modified):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def get_not_modified_response(self, request, instance):
+        etag, last_modified = self.get_validators(instance)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            return self.set_validators(response, etag, last_modified)
+        return None
+
+    def finalize_conditional_response(self, response, instance):
+        return self.set_validators(response, *self.get_validators(instance))
@@ -0,0 +1,177 @@
+import hashlib
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from rest_framework.permissions import SAFE_METHODS
+
+# Set by ReplicaRoutingMiddleware for safe requests that may read stale
+# data. Everything else (writes, management commands, shells) reads from
+# the primary.
+_read_from_replica = ContextVar('read_from_replica', default=False)
+
+STICKY_COOKIE = 'db_primary_until'
+
+
+def get_replicas():
+    return settings.REPLICA_DATABASES
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if replicas and _read_from_replica.get():
+            return random.choice(replicas)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        return obj1._state.db in aliases and obj2._state.db in aliases
+
+
+def _sticky_key(request):
+    # API clients authenticate with a bearer token and may not keep
+    # cookies, so stickiness is also recorded against the token.
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if not authorization:
+        return None
+    return 'db:sticky:' + hashlib.md5(authorization.encode()).hexdigest()
+
+
+def _sticky_cookie(request):
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def is_sticky(request):
+    if _sticky_cookie(request):
+        return True
+    key = _sticky_key(request)
+    return key is not None and cache.get(key) is not None
+
+
+async def ais_sticky(request):
+    if _sticky_cookie(request):
+        return True
+    key = _sticky_key(request)
+    return key is not None and await cache.aget(key) is not None
+
+
+def _set_sticky_cookie(response):
+    until = time.time() + settings.REPLICA_STICKY_SECONDS
+    response.set_cookie(STICKY_COOKIE, f'{until:.0f}', max_age=settings.REPLICA_STICKY_SECONDS,
+                        httponly=True, samesite='Lax')
+
+
+def mark_sticky(request, response):
+    _set_sticky_cookie(response)
+    key = _sticky_key(request)
+    if key is not None:
+        cache.set(key, 1, timeout=settings.REPLICA_STICKY_SECONDS)
+
+
+async def amark_sticky(request, response):
+    _set_sticky_cookie(response)
+    key = _sticky_key(request)
+    if key is not None:
+        await cache.aset(key, 1, timeout=settings.REPLICA_STICKY_SECONDS)
+
+
+class ReplicaRoutingMiddleware:
+    # Safe requests read from a replica unless the client wrote something
+    # in the last REPLICA_STICKY_SECONDS, so users see their own changes.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        safe = request.method in SAFE_METHODS
+        token = _read_from_replica.set(safe and bool(get_replicas()) and not is_sticky(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_from_replica.reset(token)
+        if not safe:
+            mark_sticky(request, response)
+        return response
+
+    async def __acall__(self, request):
+        safe = request.method in SAFE_METHODS
+        token = _read_from_replica.set(safe and bool(get_replicas()) and not await ais_sticky(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_from_replica.reset(token)
+        if not safe:
+            await amark_sticky(request, response)
+        return response
+
+
+def atomic_writes(view):
+    # Opts a view out of ATOMIC_REQUESTS for safe methods, which then skip
+    # the transaction (and the connection) on the primary; other methods
+    # still run in one.
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return view(request, *args, **kwargs)
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            return view(request, *args, **kwargs)
+    return transaction.non_atomic_requests(wrapper)
+
+
+class AtomicWritesMixin:
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return atomic_writes(super().as_view(**initkwargs))
+
+
+def get_pool_stats():
+    # Per process: each worker has its own pool.
+    stats = {}
+    for connection in connections.all(initialized_only=False):
+        pool = getattr(connection, 'pool', None)
+        if pool is None:
+            stats[connection.alias] = {
+                'pooled': False,
+                'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+                'health_checks': connection.settings_dict['CONN_HEALTH_CHECKS'],
+                'connected': connection.connection is not None,
+            }
+            continue
+        raw = pool.get_stats()
+        in_use = raw.get('pool_size', 0) - raw.get('pool_available', 0)
+        requests = raw.get('requests_num', 0)
+        stats[connection.alias] = {
+            'pooled': True,
+            'min_size': raw.get('pool_min'),
+            'max_size': raw.get('pool_max'),
+            'size': raw.get('pool_size', 0),
+            'in_use': in_use,
+            'idle': raw.get('pool_available', 0),
+            'waiting': raw.get('requests_waiting', 0),
+            'requests': requests,
+            'queued': raw.get('requests_queued', 0),
+            'avg_wait_ms': raw.get('requests_wait_ms', 0) / requests if requests else 0,
+            'timeouts': raw.get('requests_errors', 0),
+            'connections_opened': raw.get('connections_num', 0),
+            'connections_lost': raw.get('connections_lost', 0) + raw.get('returns_bad', 0),
+            'saturated': in_use >= raw.get('pool_max', 0) or raw.get('requests_waiting', 0) > 0,
+        }
+    return stats
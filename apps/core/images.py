@@ -0,0 +1,109 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .cache import INVALIDATED_BY, bump_versions_on_commit
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.IMAGE_VARIANT_WORKERS,
+                    thread_name_prefix='image-variants',
+                )
+    return _executor
+
+
+def render_variant(image, size):
+    variant = image.copy()
+    variant.thumbnail(size, Image.Resampling.LANCZOS)
+    buffer = BytesIO()
+    variant.save(buffer, format=settings.IMAGE_VARIANT_FORMAT, quality=settings.IMAGE_VARIANT_QUALITY)
+    return buffer.getvalue()
+
+
+def build_variants(field_file):
+    storage = field_file.storage
+    stem, _ = os.path.splitext(field_file.name)
+    extension = settings.IMAGE_VARIANT_FORMAT.lower()
+
+    with storage.open(field_file.name, 'rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    variants = {'source': field_file.name}
+    for name, size in settings.IMAGE_VARIANTS.items():
+        path = f'variants/{stem}_{name}.{extension}'
+        if storage.exists(path):
+            storage.delete(path)
+        variants[name] = storage.save(path, ContentFile(render_variant(image, size)))
+    return variants
+
+
+def process_variants(model_label, pk, field_name, variants_field):
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).only(field_name).first()
+    field_file = getattr(instance, field_name, None)
+    if not field_file:
+        return None
+
+    variants = build_variants(field_file)
+    changes = {variants_field: variants}
+    # update() skips auto_now, and the conditional-request validators and
+    # cached responses have to notice the new variants.
+    changes.update({field.name: timezone.now() for field in model._meta.concrete_fields
+                    if getattr(field, 'auto_now', False)})
+    # Only record the result if the image was not replaced meanwhile.
+    if model.objects.filter(pk=pk, **{field_name: field_file.name}).update(**changes):
+        bump_versions_on_commit(*INVALIDATED_BY.get(model._meta.label, ()))
+    return variants
+
+
+def _run_in_worker(*args):
+    try:
+        process_variants(*args)
+    except Exception:
+        logger.exception('Could not generate image variants for %s', args[:2])
+    finally:
+        connections.close_all()
+
+
+def schedule_variants(instance, field_name, variants_field):
+    field_file = getattr(instance, field_name)
+    variants = getattr(instance, variants_field) or {}
+    if not field_file or field_file.name == variants.get('source'):
+        return
+
+    args = (instance._meta.label, instance.pk, field_name, variants_field)
+    if settings.IMAGE_VARIANTS_ASYNC:
+        transaction.on_commit(lambda: get_executor().submit(_run_in_worker, *args))
+    else:
+        transaction.on_commit(lambda: process_variants(*args))
+
+
+def variant_urls(field_file, variants, request=None):
+    if not field_file or not variants or variants.get('source') != field_file.name:
+        return None
+    urls = {}
+    for name in settings.IMAGE_VARIANTS:
+        if name in variants:
+            url = field_file.storage.url(variants[name])
+            urls[name] = request.build_absolute_uri(url) if request is not None else url
+    return urls
@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apps.accounts.models import User
+from apps.core.images import process_variants
+from apps.main.models import Post
+
+TARGETS = (
+    (Post, 'image', 'image_variants'),
+    (User, 'avatar', 'avatar_variants'),
+)
+
+
+def _process(*args):
+    try:
+        return process_variants(*args)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Generate missing or outdated image variants for posts and avatars'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate existing variants too')
+        parser.add_argument('--workers', type=int, default=settings.IMAGE_VARIANT_WORKERS)
+
+    def handle(self, *args, **options):
+        jobs = []
+        for model, field_name, variants_field in TARGETS:
+            rows = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            for pk, name, variants in rows.values_list('pk', field_name, variants_field).iterator():
+                if options['force'] or (variants or {}).get('source') != name:
+                    jobs.append((model._meta.label, pk, field_name, variants_field))
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            done = sum(1 for result in executor.map(lambda job: _process(*job), jobs) if result)
+        self.stdout.write(self.style.SUCCESS(f'Generated variants for {done} images'))
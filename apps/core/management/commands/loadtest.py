@@ -0,0 +1,76 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+async def fetch(url, read_delay):
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    writer.write(
+        f'GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nConnection: close\r\n\r\n'.encode()
+    )
+    await writer.drain()
+    status_line = await reader.readline()
+    # A slow client keeps the connection (and a sync worker) busy while
+    # it trickles the response in.
+    while True:
+        chunk = await reader.read(4096)
+        if not chunk:
+            break
+        if read_delay:
+            await asyncio.sleep(read_delay)
+    writer.close()
+    return int(status_line.split()[1])
+
+
+class Command(BaseCommand):
+    help = 'Hit a running server with concurrent (optionally slow) clients and report throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='e.g. http://127.0.0.1:8000/api/v1/posts/recent/')
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--read-delay', type=float, default=0,
+                            help='Seconds to wait between reads of each response chunk')
+        parser.add_argument('--label', default='')
+
+    def handle(self, *args, **options):
+        if any(urlsplit(url).scheme != 'http' for url in options['urls']):
+            raise CommandError('Only plain http:// URLs are supported')
+        latencies, statuses, elapsed = asyncio.run(self.run(options))
+
+        latencies.sort()
+        errors = sum(1 for status in statuses if status >= 400)
+        percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+        label = f'[{options["label"]}] ' if options['label'] else ''
+        self.stdout.write(
+            f'{label}{len(latencies)} requests, concurrency {options["concurrency"]}: '
+            f'{len(latencies) / elapsed:.1f} req/s, '
+            f'mean {statistics.mean(latencies) * 1000:.1f} ms, p50 {percentile(0.5):.1f} ms, '
+            f'p95 {percentile(0.95):.1f} ms, p99 {percentile(0.99):.1f} ms, errors {errors}'
+        )
+
+    async def run(self, options):
+        urls = options['urls']
+        queue = asyncio.Queue()
+        for index in range(options['requests']):
+            queue.put_nowait(urls[index % len(urls)])
+        latencies, statuses = [], []
+
+        async def client():
+            while not queue.empty():
+                url = queue.get_nowait()
+                started = time.perf_counter()
+                try:
+                    statuses.append(await fetch(url, options['read_delay']))
+                except OSError:
+                    statuses.append(599)
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(options['concurrency'])))
+        return latencies, statuses, time.perf_counter() - started
@@ -0,0 +1,45 @@
+import io
+import pstats
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SORT_KEYS = ('cumulative', 'tottime', 'calls', 'ncalls')
+
+
+class Command(BaseCommand):
+    help = 'Merge the profiles written by ProfilingMiddleware into a top-N hot function report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', default='', help='Only views whose name contains this text')
+        parser.add_argument('--top', type=int, default=25)
+        parser.add_argument('--sort', choices=SORT_KEYS, default='tottime')
+        parser.add_argument('--per-view', action='store_true', help='One report per view instead of one merged')
+        parser.add_argument('--full-paths', action='store_true')
+
+    def handle(self, *args, **options):
+        root = Path(settings.PROFILE_DIR)
+        views = {
+            directory.name: sorted(directory.glob('*.prof'))
+            for directory in sorted(root.glob('*'))
+            if directory.is_dir() and options['view'] in directory.name
+        }
+        views = {name: files for name, files in views.items() if files}
+        if not views:
+            raise CommandError(f'No profiles found in {root}')
+
+        if options['per_view']:
+            for name, files in views.items():
+                self.report(name, files, options)
+        else:
+            self.report(', '.join(views), [path for files in views.values() for path in files], options)
+
+    def report(self, title, files, options):
+        output = io.StringIO()
+        stats = pstats.Stats(*map(str, files), stream=output)
+        if not options['full_paths']:
+            stats.strip_dirs()
+        stats.sort_stats(options['sort']).print_stats(options['top'])
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{title} ({len(files)} files)'))
+        self.stdout.write(output.getvalue())
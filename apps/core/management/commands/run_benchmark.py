@@ -0,0 +1,207 @@
+import json
+import platform
+import statistics
+import time
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.accounts.models import User
+from apps.comments.models import Comment
+from apps.main.models import Category, Post
+from .seed_benchmark import STAFF_EMAIL
+
+SKIPPED_PREFIXES = ('admin/', 'media/', 'static/')
+# Routes whose <slug> is not a post slug.
+SLUG_SOURCES = {
+    'category-detail': 'category_slug',
+    # Only the author can read a post's view stats.
+    'post-views': 'staff_slug',
+}
+
+
+def iter_patterns(patterns, prefix=''):
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from iter_patterns(pattern.url_patterns, route)
+        elif isinstance(pattern, URLPattern):
+            yield route, pattern
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    help = 'Time every GET route in config/urls.py against seeded data and write the results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--output', default='', help='Defaults to benchmark-<timestamp>.json')
+        parser.add_argument('--filter', default='', help='Only routes containing this text')
+        parser.add_argument('--cold', action='store_true', help='Clear the cache before every request')
+        parser.add_argument('--compare', help='Earlier results file to diff p50 latency against')
+
+    def handle(self, *args, **options):
+        staff = User.objects.filter(email=STAFF_EMAIL).first()
+        if staff is None:
+            raise CommandError('No benchmark data, run seed_benchmark first')
+
+        self.options = options
+        self.values = self.pick_values(staff)
+        self.staff_headers = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(staff)}'}
+
+        results, failed = [], []
+        for route, pattern in iter_patterns(get_resolver().url_patterns):
+            if route.startswith(SKIPPED_PREFIXES) or options['filter'] not in route:
+                continue
+            url = self.build_url(route, pattern)
+            if url is None:
+                self.stderr.write(f'skipped {route}: no value for its parameters')
+                continue
+            result = self.measure(route, pattern.name, url)
+            if result is None:
+                self.stderr.write(f'skipped {route}: GET not allowed')
+                continue
+            if result['status'] >= 400:
+                # An error page is not a measurement of the route.
+                self.stderr.write(self.style.ERROR(f"failed {route}: {result['status']} as {result['auth']}"))
+                failed.append(result)
+                continue
+            results.append(result)
+            self.report(result)
+
+        output = Path(options['output'] or f'benchmark-{timezone.now():%Y%m%d-%H%M%S}.json')
+        output.write_text(json.dumps({'meta': self.meta(), 'results': results, 'failed': failed}, indent=2))
+        self.stdout.write(self.style.SUCCESS(f'Wrote {len(results)} results to {output}'))
+        if options['compare']:
+            self.compare(results, json.loads(Path(options['compare']).read_text())['results'])
+        if failed:
+            raise CommandError(f'{len(failed)} routes returned an error status and were not measured')
+
+    def pick_values(self, staff):
+        # The busiest objects, so detail routes are measured at their worst.
+        posts = Post.objects.filter(status='published').order_by('-comments_count', 'pk')
+        post = posts.values('pk', 'slug').first()
+        own_post = posts.filter(author=staff).values('slug').first()
+        category = (Category.objects.annotate(total=Count('posts')).order_by('-total', 'pk')
+                    .values('slug').first())
+        comment = (Comment.objects.filter(parent=None, is_active=True)
+                   .annotate(total=Count('replies', filter=Q(replies__is_active=True)))
+                   .order_by('-total', 'pk').values('pk').first())
+        return {
+            'slug': post and post['slug'],
+            'staff_slug': own_post and own_post['slug'],
+            'post_id': post and post['pk'],
+            'category_slug': category and category['slug'],
+            'comment_id': comment and comment['pk'],
+            'pk': comment and comment['pk'],
+            'kind': 'rss',
+            'chunk': 0,
+        }
+
+    def build_url(self, route, pattern):
+        kwargs = {}
+        for name in pattern.pattern.converters:
+            source = SLUG_SOURCES.get(pattern.name, name) if name == 'slug' else name
+            value = self.values.get(source)
+            if value is None:
+                return None
+            kwargs[name] = value
+        path = route
+        for name, value in kwargs.items():
+            start = path.index('<')
+            path = path[:start] + str(value) + path[path.index('>', start) + 1:]
+        return '/' + path
+
+    def request(self, client, url, headers):
+        started = time.perf_counter()
+        response = client.get(url, **headers)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response, time.perf_counter() - started
+
+    def measure(self, route, name, url):
+        # The default `testserver` host is not in ALLOWED_HOSTS.
+        client = Client(SERVER_NAME='localhost', raise_request_exception=False)
+        # Routes that fail anonymously are measured as the staff user.
+        headers, auth = {}, 'anonymous'
+        response, _ = self.request(client, url, headers)
+        if response.status_code >= 400:
+            headers, auth = self.staff_headers, 'staff'
+            response, _ = self.request(client, url, headers)
+        if response.status_code == 405:
+            return None
+        if response.status_code >= 400:
+            return {'route': route, 'name': name, 'url': url, 'auth': auth, 'status': response.status_code}
+
+        for _ in range(self.options['warmup']):
+            self.request(client, url, headers)
+
+        latencies, queries = [], []
+        for _ in range(self.options['iterations']):
+            if self.options['cold']:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                response, elapsed = self.request(client, url, headers)
+            latencies.append(elapsed * 1000)
+            queries.append(len(captured))
+
+        return {
+            'route': route,
+            'name': name,
+            'url': url,
+            'auth': auth,
+            'status': response.status_code,
+            'bytes': len(response.content) if not response.streaming else None,
+            'queries': max(queries),
+            'mean_ms': round(statistics.mean(latencies), 2),
+            'p50_ms': round(percentile(latencies, 0.5), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'max_ms': round(max(latencies), 2),
+        }
+
+    def meta(self):
+        return {
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'iterations': self.options['iterations'],
+            'cold_cache': self.options['cold'],
+            'rows': {
+                'users': User.objects.count(),
+                'posts': Post.objects.count(),
+                'comments': Comment.objects.count(),
+            },
+        }
+
+    def report(self, result):
+        self.stdout.write(
+            f"{result['status']} {result['url']:<55} {result['queries']:>4} queries "
+            f"p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms"
+        )
+
+    def compare(self, results, previous):
+        before = {result['route']: result for result in previous}
+        for result in results:
+            old = before.get(result['route'])
+            if old is None:
+                continue
+            change = (result['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100 if old['p50_ms'] else 0
+            self.stdout.write(
+                f"{result['route']:<55} p50 {old['p50_ms']:>8.2f} -> {result['p50_ms']:>8.2f} ms "
+                f"({change:+.0f}%), queries {old['queries']} -> {result['queries']}"
+            )
@@ -0,0 +1,178 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.comments.models import Comment
+from apps.core.cache import bump_versions
+from apps.main.feeds import ALL_FEEDS_GROUP
+from apps.main.sitemaps import ALL_SITEMAPS_GROUP
+from apps.main.models import Category, Post, make_excerpt
+from apps.main.trending import refresh_trending
+from apps.subscribe.models import PinnedPost, Subscription, SubscriptionPlan
+
+PREFIX = 'bench'
+PASSWORD = 'benchmark'
+STAFF_EMAIL = f'{PREFIX}-staff@example.com'
+WORDS = (
+    'election market climate football science health music travel energy '
+    'budget court startup vaccine rocket museum festival policy housing '
+    'transport weather history finance education research league'
+).split()
+PLANS = (('Basic', '4.99'), ('Plus', '9.99'), ('Pro', '19.99'))
+
+
+def chunk_sizes(total, size):
+    for start in range(0, total, size):
+        yield min(size, total - start)
+
+
+class Command(BaseCommand):
+    help = 'Create a deterministic dataset for run_benchmark (users, posts, threaded comments, pins)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument('--reply-ratio', type=float, default=0.4,
+                            help='Share of comments that reply to another comment')
+        parser.add_argument('--subscribers', type=int, default=100)
+        parser.add_argument('--days', type=int, default=60, help='Spread posts over this many days')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if User.objects.filter(email=STAFF_EMAIL).exists():
+            # Deleting a large dataset row by row through the comment
+            # signals takes longer than reseeding an empty database.
+            raise CommandError('Benchmark data already exists, seed an empty database (manage.py flush)')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        started = time.monotonic()
+
+        users = self.step('users', self.create_users, options['users'])
+        categories = self.step('categories', self.create_categories, options['categories'])
+        posts = self.step('posts', self.create_posts, options['posts'], users, categories, options['days'])
+        self.step('comments', self.create_comments, options['comments'], options['reply_ratio'], users, posts)
+        self.step('subscriptions', self.create_subscriptions, options['subscribers'], users)
+
+        Post.recount_comments()
+        refresh_trending()
+        bump_versions('posts', 'categories', 'plans', ALL_FEEDS_GROUP, ALL_SITEMAPS_GROUP)
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded in {time.monotonic() - started:.1f}s. Staff login: {STAFF_EMAIL} / {PASSWORD}'
+        ))
+
+    def step(self, name, func, *args):
+        started = time.monotonic()
+        with transaction.atomic():
+            result = func(*args)
+        count = result if isinstance(result, int) else len(result)
+        self.stdout.write(f'{name}: {count} in {time.monotonic() - started:.1f}s')
+        return result
+
+    def create_users(self, count):
+        # Hashing is slow on purpose, so every benchmark user shares one hash.
+        password = make_password(PASSWORD)
+        users = [User(email=STAFF_EMAIL, username=f'{PREFIX}-staff', password=password,
+                      is_staff=True, is_superuser=True)]
+        users += [
+            User(email=f'{PREFIX}-user-{index}@example.com', username=f'{PREFIX}-user-{index}',
+                 first_name=self.rng.choice(WORDS).title(), password=password)
+            for index in range(count)
+        ]
+        return [user.pk for user in User.objects.bulk_create(users, batch_size=self.batch_size)]
+
+    def create_categories(self, count):
+        categories = [
+            Category(name=f'Benchmark {index} {WORDS[index % len(WORDS)]}', slug=f'{PREFIX}-{index}',
+                     description=f'Benchmark category {index}')
+            for index in range(count)
+        ]
+        return [category.pk for category in Category.objects.bulk_create(categories)]
+
+    def sentence(self, length):
+        return ' '.join(self.rng.choice(WORDS) for _ in range(length))
+
+    def create_posts(self, count, users, categories, days):
+        post_ids = []
+        for start in range(0, count, self.batch_size):
+            posts, dates = [], []
+            for index in range(start, min(start + self.batch_size, count)):
+                content = self.sentence(self.rng.randint(80, 600))
+                posts.append(Post(
+                    title=f'{self.sentence(5).capitalize()} {index}',
+                    slug=f'{PREFIX}-post-{index}',
+                    content=content,
+                    excerpt=make_excerpt(content),
+                    author_id=self.rng.choice(users),
+                    category_id=self.rng.choice(categories) if self.rng.random() > 0.1 else None,
+                    status='draft' if self.rng.random() < 0.05 else 'published',
+                    views_count=int(self.rng.paretovariate(1.2) * 10),
+                ))
+                dates.append(self.now - timedelta(seconds=self.rng.uniform(0, days * 86400)))
+            Post.objects.bulk_create(posts)
+            # auto_now_add overwrites the dates on insert.
+            for post, created_at in zip(posts, dates):
+                post.created_at = post.updated_at = created_at
+            Post.objects.bulk_update(posts, ['created_at', 'updated_at'])
+            post_ids += [post.pk for post in posts]
+        return post_ids
+
+    def create_comments(self, count, reply_ratio, users, posts):
+        # A few hot posts get most of the comments, like real traffic.
+        cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(posts))))
+        top_level = int(count * (1 - reply_ratio))
+        threads = {}
+        created = 0
+        for size in chunk_sizes(top_level, self.batch_size):
+            comments = [
+                Comment(post_id=post_id, author_id=self.rng.choice(users), content=self.sentence(20))
+                for post_id in self.rng.choices(posts, cum_weights=cum_weights, k=size)
+            ]
+            for comment in Comment.objects.bulk_create(comments):
+                threads.setdefault(comment.post_id, []).append(comment.pk)
+            created += len(comments)
+
+        parents = [(post_id, pk) for post_id, pks in threads.items() for pk in pks]
+        for size in chunk_sizes(count - top_level, self.batch_size):
+            comments = []
+            for post_id, parent_id in self.rng.choices(parents, k=size):
+                comments.append(Comment(post_id=post_id, parent_id=parent_id,
+                                        author_id=self.rng.choice(users), content=self.sentence(12)))
+            Comment.objects.bulk_create(comments)
+            created += len(comments)
+        return created
+
+    def create_subscriptions(self, count, users):
+        plans = SubscriptionPlan.objects.bulk_create([
+            SubscriptionPlan(name=name, price=Decimal(price), stripe_price_id=f'{PREFIX}-{name.lower()}',
+                             features={'pins': 1})
+            for name, price in PLANS
+        ])
+        subscribers = users[1:count + 1]
+        Subscription.objects.bulk_create([
+            Subscription(user_id=user_id, plan=self.rng.choice(plans), status='active',
+                         start_date=self.now, end_date=self.now + timedelta(days=30))
+            for user_id in subscribers
+        ])
+        # PinnedPost.save() checks the subscription; bulk_create skips it,
+        # so only pin posts the subscriber wrote.
+        pins, pinned = [], set()
+        own_posts = Post.objects.filter(author_id__in=subscribers, status='published').values_list('author_id', 'pk')
+        for author_id, post_id in own_posts.order_by('pk').iterator():
+            if author_id not in pinned:
+                pinned.add(author_id)
+                pins.append(PinnedPost(user_id=author_id, post_id=post_id))
+        PinnedPost.objects.bulk_create(pins)
+        return subscribers
@@ -0,0 +1,110 @@
+from base64 import b64decode, b64encode
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def _row_value(row, name):
+    if isinstance(row, dict):
+        return row[name]
+    return getattr(row, name)
+
+
+class KeysetPagination(BasePagination):
+    # Seeks on (created_at, id) instead of OFFSET, so every page costs the
+    # same and no COUNT(*) is needed. The ordering matches the
+    # (..., -created_at) indexes on posts and comments.
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    ordering = ('-created_at', '-id')
+    # What encode_cursor() reads from the last row of a page.
+    cursor_lookups = ('created_at', 'id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_queryset(self, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            created_at, pk = position
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            )
+        # One extra row tells whether there is a next page.
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, rows):
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.get_page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        return self.set_page([row async for row in self.get_page_queryset(queryset, request)])
+
+    def decode_cursor(self, request):
+        # Plain Django requests (async views) have no query_params.
+        params = getattr(request, 'query_params', request.GET)
+        encoded = params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            created_at, pk = b64decode(encoded.encode('ascii')).decode('ascii').split('|')
+            return datetime.fromisoformat(created_at), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row):
+        created_at, pk = (_row_value(row, name) for name in self.cursor_lookups)
+        position = f'{created_at.isoformat()}|{pk}'
+        return b64encode(position.encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+
+class OptionalCursorPagination(PageNumberPagination):
+    # Page numbers by default; requests carrying `?cursor=` (empty for the
+    # first page) switch to keyset pagination.
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_next_link(self):
+        if self.keyset is not None:
+            return self.keyset.get_next_link()
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        if self.keyset is not None:
+            return None
+        return super().get_previous_link()
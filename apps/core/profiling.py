@@ -0,0 +1,104 @@
+import cProfile
+import itertools
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+
+
+def profile_dir(view):
+    return Path(settings.PROFILE_DIR) / re.sub(r'[^\w.-]', '_', view)
+
+
+class ViewProfiles:
+    # Profiles of one process, summed per view. Each view's running total
+    # is rewritten to its current file after every profiled request and a
+    # new file is started every PROFILE_ROTATE_REQUESTS requests, keeping
+    # the newest PROFILE_KEEP_FILES per view.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.windows = {}
+        self.sequence = itertools.count()
+
+    def add(self, view, profile):
+        with self.lock:
+            stats, count, path = self.windows.get(view) or (None, 0, None)
+            if path is None:
+                path = self.new_file(view)
+            if stats is None:
+                stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+            count += 1
+            stats.dump_stats(path)
+            if count >= settings.PROFILE_ROTATE_REQUESTS:
+                self.windows.pop(view)
+            else:
+                self.windows[view] = (stats, count, path)
+
+    def new_file(self, view):
+        directory = profile_dir(view)
+        directory.mkdir(parents=True, exist_ok=True)
+        files = sorted(directory.glob('*.prof'), key=lambda path: path.stat().st_mtime)
+        for old in files[:max(0, len(files) - settings.PROFILE_KEEP_FILES + 1)]:
+            old.unlink(missing_ok=True)
+        return directory / f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{next(self.sequence)}.prof'
+
+
+profiles = ViewProfiles()
+
+
+class ProfilingMiddleware:
+    # Runs cProfile on PROFILE_SAMPLE_RATE of requests, and on requests
+    # from staff sending `X-Profile: 1`. Sync only: profiling an event
+    # loop would mix in every other request it serves. Removed from the
+    # stack unless PROFILING_ENABLED is set.
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.authentication = JWTAuthentication()
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler per process, so
+            # concurrent profiled requests in other threads are skipped.
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.disable()
+        match = request.resolver_match
+        profiles.add(match.view_name if match else 'unresolved', profile)
+        return response
+
+    def should_profile(self, request):
+        if request.META.get(PROFILE_HEADER) and self.is_staff(request):
+            return True
+        return random.random() < settings.PROFILE_SAMPLE_RATE
+
+    def is_staff(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            return True
+        try:
+            authenticated = self.authentication.authenticate(request)
+        except AuthenticationFailed:
+            return False
+        return authenticated is not None and authenticated[0].is_staff
@@ -0,0 +1,226 @@
+from operator import itemgetter
+
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .images import variant_urls
+from .pagination import KeysetPagination
+from .timing import timed
+
+
+def split_names(value):
+    return {name.strip() for name in value.split(',') if name.strip()} if value else set()
+
+
+def sparse_fieldset(request, names):
+    # The output keys kept by ?fields=a,b and/or ?exclude=c on a safe
+    # request, in declaration order; None when neither is given.
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    include = split_names(request.GET.get('fields'))
+    exclude = split_names(request.GET.get('exclude'))
+    if not include and not exclude:
+        return None
+    unknown = (include | exclude).difference(names)
+    if unknown:
+        raise ValidationError({'fields': f'Unknown fields: {", ".join(sorted(unknown))}'})
+    return [name for name in names if (not include or name in include) and name not in exclude]
+
+
+def select_related_paths(tree, prefix=''):
+    for name, children in tree.items():
+        yield prefix + name
+        yield from select_related_paths(children, f'{prefix}{name}__')
+
+
+def only_fields(queryset, names):
+    # only() refuses to defer a relation select_related() follows, so the
+    # joins nothing reads any more are dropped first.
+    related = queryset.query.select_related
+    if isinstance(related, dict):
+        paths = [path for path in select_related_paths(related) if path.split('__')[0] in names]
+        queryset = queryset.select_related(None)
+        if paths:
+            queryset = queryset.select_related(*paths)
+    return queryset.only(*names)
+
+
+class SparseFieldsMixin:
+    # For ModelSerializers: drops the fields a ?fields= / ?exclude= request
+    # leaves out, and narrow() trims the view's queryset to the columns
+    # and annotations the kept fields read. `field_dependencies` names the
+    # model fields behind method fields and properties (a field it cannot
+    # resolve leaves the columns alone); `field_annotations` maps a field
+    # to the queryset method computing it. A parent serializer can pass the
+    # kept names down as context['sparse_fields'].
+    field_dependencies = {}
+    field_annotations = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        kept = self.context.get('sparse_fields')
+        if kept is None:
+            kept = sparse_fieldset(self.context.get('request'), list(self.fields))
+        self.sparse = kept is not None
+        if self.sparse:
+            for name in set(self.fields).difference(kept):
+                self.fields.pop(name)
+
+    def narrow(self, queryset, required=()):
+        for name, method in self.field_annotations.items():
+            if name in self.fields:
+                queryset = getattr(queryset, method)()
+        if not self.sparse:
+            return queryset
+
+        opts = queryset.model._meta
+        needed = {opts.pk.name, *required}
+        for name, field in self.fields.items():
+            if name in self.field_annotations:
+                continue
+            if name in self.field_dependencies:
+                needed.update(self.field_dependencies[name])
+                continue
+            try:
+                model_field = opts.get_field(field.source.split('.')[0])
+            except FieldDoesNotExist:
+                return queryset
+            if not model_field.concrete:
+                return queryset
+            needed.add(model_field.name)
+        return only_fields(queryset, needed)
+
+
+class SparseQuerysetMixin:
+    # Generic views narrow their queryset on safe requests through a
+    # SparseFieldsMixin serializer. `sparse_required_fields` are the
+    # columns the view reads itself (validators and the like).
+    sparse_required_fields = ()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        serializer = self.get_serializer()
+        if not isinstance(serializer, SparseFieldsMixin):
+            return queryset
+        required = self.sparse_required_fields
+        if KeysetPagination.cursor_query_param in self.request.query_params:
+            required = (*required, *KeysetPagination.cursor_lookups)
+        return serializer.narrow(queryset, required)
+
+
+class ValuesSerializer:
+    # Read-only serializer over values() rows. Each entry of `fields` is
+    # (output key, values() lookup[, converter]), where a converter may be
+    # named by a method of the serializer; a `format_<key>(row)` method
+    # takes over for keys computed from several lookups. Accessors are
+    # resolved once per instance, so serializing a row is a single pass
+    # over plain dicts. ?fields= / ?exclude= narrow both the output and
+    # the values() lookups.
+    fields = ()
+    extra_lookups = ()
+    # Lookups a format_<key>() method reads besides the key's own.
+    format_lookups = {}
+    # Output keys subclasses add outside `fields`.
+    computed_fields = ()
+    # Added to the output when the queryset carries them (search rank etc.).
+    optional_annotations = ()
+
+    def __init__(self, context=None, selected=None):
+        # `selected` names the output keys outright instead of reading
+        # ?fields= / ?exclude= from the request.
+        self.context = context or {}
+        self.request = self.context.get('request')
+        self.annotations = []
+        self.datetime_field = serializers.DateTimeField()
+        self.timezone = self.datetime_field.default_timezone()
+        self.iso_datetimes = (api_settings.DATETIME_FORMAT or '').lower() == ISO_8601
+        if selected is None:
+            names = [field[0] for field in self.fields] + list(self.computed_fields)
+            kept = sparse_fieldset(self.request, names)
+            selected = names if kept is None else kept
+        self.selected = set(selected)
+        self.accessors = [self.compile_accessor(*field) for field in self.fields if field[0] in self.selected]
+
+    def compile_accessor(self, name, lookup, converter=None):
+        formatter = getattr(self, f'format_{name}', None)
+        if formatter is not None:
+            return name, formatter
+        if isinstance(converter, str):
+            converter = getattr(self, converter)
+        if converter is not None:
+            return name, lambda row: converter(row[lookup])
+        return name, itemgetter(lookup)
+
+    def values(self, queryset):
+        fields = [field for field in self.fields if field[0] in self.selected]
+        lookups = dict.fromkeys(field[1] for field in fields)
+        for field in fields:
+            lookups.update(dict.fromkeys(self.format_lookups.get(field[0], ())))
+        lookups.update(dict.fromkeys(self.extra_lookups))
+        if self.request is not None and KeysetPagination.cursor_query_param in self.request.GET:
+            # The cursor needs these even when ?fields= leaves them out;
+            # only the selected keys reach the output.
+            lookups.update(dict.fromkeys(KeysetPagination.cursor_lookups))
+        self.annotations = [name for name in self.optional_annotations
+                            if name in queryset.query.annotations]
+        lookups.update(dict.fromkeys(self.annotations))
+        return queryset.values(*lookups or ['pk'])
+
+    def to_representation(self, row):
+        data = {name: accessor(row) for name, accessor in self.accessors}
+        for name in self.annotations:
+            data[name] = row[name]
+        return data
+
+    def many(self, rows):
+        with timed('serialize'):
+            return [self.to_representation(row) for row in rows]
+
+    async def amany(self, rows):
+        # For async views; subclasses that query more rows override this.
+        return self.many(rows)
+
+    def to_datetime(self, value):
+        # DRF's DateTimeField output without resolving the active timezone
+        # for every value.
+        if not self.iso_datetimes or not value or self.timezone is None or timezone.is_naive(value):
+            return self.datetime_field.to_representation(value)
+        value = value.astimezone(self.timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+    def file_url(self, field, name, absolute=True):
+        # Same output as DRF's FileField for the stored file name.
+        if not name:
+            return None
+        url = field.storage.url(name)
+        if absolute and self.request is not None:
+            return self.request.build_absolute_uri(url)
+        return url
+
+    def file_variants(self, field, name, variants, absolute=True):
+        field_file = field.attr_class(None, field, name)
+        return variant_urls(field_file, variants, self.request if absolute else None)
+
+
+class ValuesListMixin:
+    # List views with a `values_serializer_class` skip the ModelSerializer
+    # on GET and serialize values() rows instead.
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.values_serializer_class is None:
+            return super().list(request, *args, **kwargs)
+
+        serializer = self.values_serializer_class(context=self.get_serializer_context())
+        queryset = serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.many(page))
+        return Response(serializer.many(queryset))
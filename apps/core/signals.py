@@ -0,0 +1,14 @@
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save
+
+from .cache import INVALIDATED_BY, bump_versions_on_commit
+
+
+def connect_cache_invalidation():
+    for label, groups in INVALIDATED_BY.items():
+        def invalidate(sender, groups=groups, **kwargs):
+            bump_versions_on_commit(*groups)
+
+        model = apps.get_model(label)
+        post_save.connect(invalidate, sender=model, weak=False, dispatch_uid=f'respcache-save-{label}')
+        post_delete.connect(invalidate, sender=model, weak=False, dispatch_uid=f'respcache-delete-{label}')
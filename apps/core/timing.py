@@ -0,0 +1,200 @@
+import json
+import logging
+import random
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models import QuerySet
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger(f'{__name__}.slow_queries')
+
+# Timings of the request being handled. The object is shared with the
+# threads sync_to_async runs database work in, so they add to it too.
+_current = ContextVar('request_timings', default=None)
+
+PROJECT_DIR = str(settings.BASE_DIR) + '/'
+APPS_DIR = PROJECT_DIR + 'apps/'
+CORE_DIR = APPS_DIR + 'core/'
+
+
+def is_enabled():
+    return bool(settings.REQUEST_TIMING_SAMPLE_RATE or settings.SLOW_QUERY_MS)
+
+
+class RequestTimings:
+    def __init__(self, request, sampled):
+        self.started = time.perf_counter()
+        self.request = request
+        self.sampled = sampled
+        self.queries = 0
+        self.durations = {'db': 0.0, 'serialize': 0.0, 'render': 0.0}
+        self.active = set()
+
+    def header(self, total):
+        db = self.durations['db'] * 1000
+        return ', '.join([
+            f'db;dur={db:.2f};desc="{self.queries} queries"',
+            f'serialize;dur={self.durations["serialize"] * 1000:.2f}',
+            f'render;dur={self.durations["render"] * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+
+@contextmanager
+def timed(name):
+    # Time spent in queries inside the block is left to `db`, so the
+    # Server-Timing entries do not overlap. Nested blocks of the same name
+    # (a serializer calling .data on another) count once.
+    timings = _current.get()
+    if timings is None or not timings.sampled or name in timings.active:
+        yield
+        return
+    timings.active.add(name)
+    db_before = timings.durations['db']
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        timings.durations[name] += elapsed - (timings.durations['db'] - db_before)
+        timings.active.discard(name)
+
+
+def view_name(request):
+    match = request.resolver_match
+    return match.view_name if match else None
+
+
+def calling_frame():
+    # The innermost frame in app code, e.g. CategorySerializer.get_posts_count
+    # (apps/main/serializers.py:41), or else the innermost call on an app
+    # class, e.g. CategoryDetailView.get_object for DRF code evaluating a
+    # view's queryset. apps/core only holds the generic plumbing.
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename.startswith(APPS_DIR) and not code.co_filename.startswith(CORE_DIR):
+            name = getattr(code, 'co_qualname', code.co_name)
+            return f'{name} ({code.co_filename[len(PROJECT_DIR):]}:{frame.f_lineno})'
+        owner = type(frame.f_locals.get('self'))
+        if (owner.__module__.startswith('apps.') and not owner.__module__.startswith('apps.core.')
+                and not issubclass(owner, QuerySet)):
+            return f'{owner.__name__}.{code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+def query_timer(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        timings = _current.get()
+        if timings is not None:
+            timings.queries += 1
+            timings.durations['db'] += elapsed
+        if settings.SLOW_QUERY_MS and elapsed * 1000 >= settings.SLOW_QUERY_MS:
+            # Parameters are left out, they can hold personal data.
+            slow_query_logger.warning(json.dumps({
+                'duration_ms': round(elapsed * 1000, 2),
+                'database': context['connection'].alias,
+                'caller': calling_frame(),
+                'view': view_name(timings.request) if timings is not None else None,
+                'sql': sql,
+            }))
+
+
+def add_query_timer(sender, connection, **kwargs):
+    # Connections are per thread and may be reopened, so the wrapper is
+    # added to each one as it connects.
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
+
+
+def install_instrumentation():
+    if not is_enabled():
+        return
+    connection_created.connect(add_query_timer, dispatch_uid='apps.core.timing')
+
+    # Every DRF serializer goes through BaseSerializer.data once at the top
+    # level; nested ones call to_representation directly.
+    data = BaseSerializer.data
+
+    def timed_data(self):
+        with timed('serialize'):
+            return data.fget(self)
+    BaseSerializer.data = property(timed_data)
+
+
+class TimedJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('render'):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class RequestTimingMiddleware:
+    # Adds a Server-Timing header and a log line with query count, DB,
+    # serializer and render time to REQUEST_TIMING_SAMPLE_RATE of requests.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = is_enabled()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        timings = RequestTimings(request, random.random() < settings.REQUEST_TIMING_SAMPLE_RATE)
+        token = _current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        timings = RequestTimings(request, random.random() < settings.REQUEST_TIMING_SAMPLE_RATE)
+        token = _current.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        if not timings.sampled:
+            return response
+        total = time.perf_counter() - timings.started
+        if settings.REQUEST_TIMING_HEADER:
+            existing = response.get('Server-Timing')
+            header = timings.header(total)
+            response['Server-Timing'] = f'{existing}, {header}' if existing else header
+
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': view_name(request),
+            'status': response.status_code,
+            'queries': timings.queries,
+            'db_ms': round(timings.durations['db'] * 1000, 2),
+            'serialize_ms': round(timings.durations['serialize'] * 1000, 2),
+            'render_ms': round(timings.durations['render'] * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+        }))
+        return response
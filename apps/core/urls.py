@@ -0,0 +1,7 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('cache/', views.cache_stats, name='metrics-cache'),
+    path('db-pool/', views.db_pool_stats, name='metrics-db-pool'),
+]
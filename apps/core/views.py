@@ -0,0 +1,18 @@
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from .cache import get_stats
+from .db import get_pool_stats
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def cache_stats(request):
+    return Response(get_stats())
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def db_pool_stats(request):
+    return Response(get_pool_stats())
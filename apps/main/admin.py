@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.db.models import Count
 from django.utils.html import format_html
 from .models import Category, Post
 
@@ -12,9 +13,13 @@ class CategoryAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at',)
 
     def posts_count(self, obj):
-        return obj.posts.count()
+        return obj.total_posts
 
     posts_count.short_description = 'Posts Count'
+    posts_count.admin_order_field = 'total_posts'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(total_posts=Count('posts'))
 
 
 @admin.register(Post)
@@ -26,7 +31,7 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('status', 'category', 'created_at', 'updated_at')
     search_fields = ('title', 'content', 'author__username')
     prepopulated_fields = {'slug': ('title',)}
-    readonly_fields = ('created_at', 'updated_at', 'views_count')
+    readonly_fields = ('created_at', 'updated_at', 'views_count', 'comments_count')
     raw_id_fields = ('author',)
 
     fieldsets = (
@@ -37,15 +42,10 @@ class PostAdmin(admin.ModelAdmin):
             'fields': ('category', 'author', 'status')
         }),
         ('Statistics', {
-            'fields': ('views_count', 'created_at', 'updated_at'),
+            'fields': ('views_count', 'comments_count', 'created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
 
-    def comments_count(self, obj):
-        return obj.comments.count()
-
-    comments_count.short_description = 'Comments'
-
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('author', 'category')
\ No newline at end of file
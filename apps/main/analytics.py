@@ -0,0 +1,87 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import PostDailyViews, PostViewEvent
+
+UPSERT_BATCH_SIZE = 500
+
+
+def upsert_daily_views(rows):
+    # rows are (post id, date, views). Increments in place, which
+    # bulk_create(update_conflicts=True) cannot do; the syntax is shared by
+    # PostgreSQL and SQLite.
+    table = connection.ops.quote_name(PostDailyViews._meta.db_table)
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        batch = rows[start:start + UPSERT_BATCH_SIZE]
+        params = []
+        for post_id, day, views in batch:
+            params += [post_id, connection.ops.adapt_datefield_value(day), views]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (post_id, date, views) '
+                f'VALUES {", ".join(["(%s, %s, %s)"] * len(batch))} '
+                f'ON CONFLICT (post_id, date) DO UPDATE SET views = {table}.views + EXCLUDED.views',
+                params,
+            )
+
+
+def prune_view_events(days=None, batch_size=5000):
+    # The daily rollups keep the history, so raw events only need to
+    # outlive the window anyone debugs or re-aggregates them in.
+    cutoff = timezone.now() - timedelta(days=settings.VIEW_EVENT_RETENTION_DAYS if days is None else days)
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(PostViewEvent.objects.filter(viewed_at__lt=cutoff)
+                       .values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            deleted += PostViewEvent.objects.filter(pk__in=ids).delete()[0]
+
+
+def parse_range(params):
+    # ?days=N ending today, or ?start=YYYY-MM-DD&end=YYYY-MM-DD.
+    today = timezone.localdate()
+    try:
+        if 'start' in params or 'end' in params:
+            end = date.fromisoformat(params['end']) if params.get('end') else today
+            start = date.fromisoformat(params['start']) if params.get('start') else end - timedelta(days=29)
+        else:
+            end = today
+            start = end - timedelta(days=int(params.get('days', 30)) - 1)
+    except (ValueError, OverflowError):
+        raise ValidationError({'range': 'Use ?days=N or ?start=YYYY-MM-DD&end=YYYY-MM-DD'})
+    if start > end:
+        raise ValidationError({'range': 'start must not be after end'})
+    if (end - start).days >= settings.VIEW_STATS_MAX_DAYS:
+        raise ValidationError({'range': f'At most {settings.VIEW_STATS_MAX_DAYS} days'})
+    return start, end
+
+
+def daily_views(posts, start, end):
+    # Zero-filled per-day totals for the posts, read from the rollups only.
+    rows = (PostDailyViews.objects.filter(post__in=posts, date__range=(start, end))
+            .values('date').annotate(total=Sum('views')).values_list('date', 'total'))
+    totals = dict(rows)
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    series = [{'date': day, 'views': totals.get(day, 0)} for day in days]
+    return {
+        'start': start,
+        'end': end,
+        'total': sum(totals.values()),
+        'days': series,
+    }
+
+
+def top_posts_by_views(posts, start, end, limit=10):
+    return list(
+        PostDailyViews.objects.filter(post__in=posts, date__range=(start, end))
+        .values('post_id', title=F('post__title'), slug=F('post__slug'))
+        .annotate(views=Sum('views'))
+        .order_by('-views', 'post_id')[:limit]
+    )
@@ -0,0 +1,55 @@
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.http import require_safe
+
+from apps.core.async_views import async_api_view, json_response
+from apps.core.cache import acached_data
+from .models import Post
+from .serializers import PostDetailSerializer, PostListValuesSerializer
+from .views import PostDetailView
+
+# Async twins of the hot read endpoints, routed instead of the sync views
+# when ASYNC_READ_VIEWS is set (serve config/asgi.py then). Responses are
+# byte-identical to the sync versions.
+
+
+@require_safe
+@async_api_view
+async def recent_posts(request):
+    async def build():
+        serializer = PostListValuesSerializer(context={'request': request})
+        posts = serializer.values(Post.objects.filter(
+            status='published',
+        ).order_by('-views_count')[:10])
+        return serializer.many([row async for row in posts])
+
+    data, outcome = await acached_data(request, 'apps.main.views.recent_posts', ('posts',), build)
+    response = json_response(data)
+    if outcome is not None:
+        response['X-Cache'] = outcome.upper()
+    return response
+
+
+sync_post_detail = PostDetailView.as_view()
+detail_view = PostDetailView()
+
+
+@async_api_view
+async def post_detail(request, slug):
+    if request.method not in ('GET', 'HEAD'):
+        # Writes keep going through the DRF view and its transaction.
+        return await sync_to_async(sync_post_detail)(request, slug=slug)
+
+    serializer = PostDetailSerializer(context={'request': request})
+    queryset = serializer.narrow(PostDetailView.queryset.all(), PostDetailView.sparse_required_fields)
+    post = await aget_object_or_404(queryset, slug=slug)
+    not_modified = detail_view.get_not_modified_response(request, post)
+    if not_modified is not None:
+        return not_modified
+
+    if request.method == 'GET':
+        await post.aincrement_views()
+    serializer.instance = post
+    data = serializer.data
+    return detail_view.finalize_conditional_response(json_response(data), post)
+
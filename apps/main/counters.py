@@ -0,0 +1,240 @@
+import atexit
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+# Hits are buffered per (post id, minute) so a flush can also write the
+# per-minute view events and the daily rollups, see write_views().
+def view_key(post_id, viewed_at=None):
+    return post_id, int((viewed_at or time.time()) // 60)
+
+
+# Per-process buffer: views pending since the last flush are lost if the
+# process dies, which bounds the loss to one flush interval.
+class LocalViewStore:
+    # Only holds a lock briefly, so async views may call it directly.
+    blocking = False
+    # Other processes (`manage.py flush_views`) cannot see the buffer.
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(int)
+        self._total = 0
+
+    def add(self, key, count=1):
+        with self._lock:
+            self._pending[key] += count
+            self._total += count
+            return self._total
+
+    def drain(self):
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+            self._total = 0
+        return dict(pending)
+
+    def restore(self, pending):
+        for key, count in pending.items():
+            self.add(key, count)
+
+
+# Shared buffer on top of a Django cache, so `flush_views` can drain
+# hits recorded by every worker. Counts only change through add/incr/decr.
+# The first hit on a key since it was drained wins a cache.add() marker
+# and registers the key in the dirty set, which is only read and written
+# under a cache lock, so concurrent workers never drop each other's keys.
+class CacheViewStore:
+    prefix = 'views:hits'
+    blocking = True
+    # Drained minute keys sit at zero until they expire.
+    key_timeout = 86400
+    lock_timeout = 5
+
+    def __init__(self, alias='default'):
+        self.cache = caches[alias]
+
+    @property
+    def shared(self):
+        # A LocMem cache lives in one process, like LocalViewStore.
+        return not isinstance(self.cache, (LocMemCache, DummyCache))
+
+    def _key(self, key):
+        post_id, minute = key
+        return f'{self.prefix}:{post_id}:{minute}'
+
+    def _incr(self, cache_key, count, timeout):
+        if self.cache.add(cache_key, count, timeout=timeout):
+            return count
+        return self.cache.incr(cache_key, count)
+
+    @contextmanager
+    def _locked(self):
+        lock_key = f'{self.prefix}:lock'
+        while not self.cache.add(lock_key, 1, timeout=self.lock_timeout):
+            time.sleep(0.001)
+        try:
+            yield
+        finally:
+            self.cache.delete(lock_key)
+
+    def add(self, key, count=1):
+        self._incr(self._key(key), count, self.key_timeout)
+        if self.cache.add(f'{self._key(key)}:dirty', 1, timeout=self.key_timeout):
+            with self._locked():
+                dirty = self.cache.get(f'{self.prefix}:dirty') or set()
+                dirty.add(key)
+                self.cache.set(f'{self.prefix}:dirty', dirty, timeout=None)
+        return self._incr(f'{self.prefix}:pending', count, None)
+
+    def drain(self):
+        with self._locked():
+            dirty = self.cache.get(f'{self.prefix}:dirty') or set()
+            self.cache.delete(f'{self.prefix}:dirty')
+        pending = {}
+        for key in dirty:
+            cache_key = self._key(key)
+            # Cleared before the count is read, so a hit landing from
+            # here on registers the key again for the next drain.
+            self.cache.delete(f'{cache_key}:dirty')
+            count = self.cache.get(cache_key) or 0
+            if count:
+                # decr instead of delete keeps hits recorded while draining
+                self.cache.decr(cache_key, count)
+                pending[key] = count
+        if pending:
+            self._incr(f'{self.prefix}:pending', -sum(pending.values()), None)
+        return pending
+
+    def restore(self, pending):
+        for key, count in pending.items():
+            self.add(key, count)
+
+
+class ViewCounter:
+    def __init__(self, store, flush_interval, max_pending):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._last_flush = time.monotonic()
+        self._flush_lock = threading.Lock()
+
+    def is_due(self, pending):
+        due = time.monotonic() - self._last_flush >= self.flush_interval
+        return due or pending >= self.max_pending
+
+    def record(self, post_id):
+        if self.is_due(self.store.add(view_key(post_id))):
+            # Run after the request transaction commits so the batch
+            # does not hold row locks for the rest of the request.
+            transaction.on_commit(self.flush)
+
+    async def arecord(self, post_id):
+        key = view_key(post_id)
+        if self.store.blocking:
+            pending = await sync_to_async(self.store.add)(key)
+        else:
+            pending = self.store.add(key)
+        if self.is_due(pending):
+            # Async views run outside a transaction, so flush right away
+            # on the thread that owns the database connection.
+            await sync_to_async(self.flush)()
+
+    def flush(self):
+        if not self._flush_lock.acquire(blocking=False):
+            return 0
+        try:
+            self._last_flush = time.monotonic()
+            pending = self.store.drain()
+            try:
+                write_views(pending)
+            except Exception:
+                self.store.restore(pending)
+                raise
+            return sum(pending.values())
+        finally:
+            self._flush_lock.release()
+
+
+def write_views(pending):
+    from .analytics import upsert_daily_views
+    from .models import Post, PostViewEvent
+
+    totals = defaultdict(int)
+    daily = defaultdict(int)
+    events = []
+    for (post_id, minute), count in pending.items():
+        viewed_at = datetime.fromtimestamp(minute * 60, tz=dt_timezone.utc)
+        totals[post_id] += count
+        daily[post_id, timezone.localdate(viewed_at)] += count
+        events.append(PostViewEvent(post_id=post_id, viewed_at=viewed_at, views=count))
+
+    by_count = defaultdict(list)
+    for post_id, count in totals.items():
+        by_count[count].append(post_id)
+
+    with transaction.atomic():
+        for count, post_ids in sorted(by_count.items()):
+            # Sorted ids keep lock order stable between concurrent flushers.
+            Post.objects.filter(pk__in=sorted(post_ids)).update(
+                views_count=F('views_count') + count
+            )
+        # Views of posts deleted since they were buffered are dropped.
+        existing = set(Post.objects.filter(pk__in=totals).values_list('pk', flat=True))
+        upsert_daily_views(sorted(
+            (post_id, day, count) for (post_id, day), count in daily.items() if post_id in existing
+        ))
+        PostViewEvent.objects.bulk_create(
+            [event for event in events if event.post_id in existing], batch_size=1000
+        )
+
+
+_counter = None
+_counter_lock = threading.Lock()
+
+
+def get_view_counter():
+    global _counter
+    if _counter is None:
+        with _counter_lock:
+            if _counter is None:
+                store_class = import_string(settings.VIEW_COUNTER_STORE)
+                _counter = ViewCounter(
+                    store=store_class(),
+                    flush_interval=settings.VIEW_COUNTER_FLUSH_INTERVAL,
+                    max_pending=settings.VIEW_COUNTER_MAX_PENDING,
+                )
+                atexit.register(_flush_at_exit)
+    return _counter
+
+
+def _flush_at_exit():
+    try:
+        _counter.flush()
+    except Exception:
+        pass
+
+
+def record_view(post_id):
+    get_view_counter().record(post_id)
+
+
+async def arecord_view(post_id):
+    await get_view_counter().arecord(post_id)
+
+
+def flush_views():
+    return get_view_counter().flush()
@@ -0,0 +1,149 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed, SyndicationFeed
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+from apps.core.cache import bump_versions_on_commit, get_versions
+from .models import Category, Post
+
+# Bumped by bulk writes that bypass model signals (imports, admin actions);
+# orphans every feed at once.
+ALL_FEEDS_GROUP = 'feeds'
+
+
+def feed_group(category_id=None):
+    return f'feeds:category:{category_id}' if category_id else 'feeds:site'
+
+
+def invalidate_feeds(*category_ids):
+    bump_versions_on_commit(feed_group(), *{feed_group(pk) for pk in category_ids if pk})
+
+
+class JsonFeed(SyndicationFeed):
+    content_type = 'application/feed+json; charset=utf-8'
+
+    def write(self, outfile, encoding):
+        feed = {
+            'version': 'https://jsonfeed.org/version/1.1',
+            'title': self.feed['title'],
+            'home_page_url': self.feed['link'],
+            'feed_url': self.feed['feed_url'],
+            'description': self.feed['description'],
+            'items': [self.item(item) for item in self.items],
+        }
+        outfile.write(json.dumps(feed, ensure_ascii=False))
+
+    def item(self, item):
+        return {
+            'id': item['unique_id'],
+            'url': item['link'],
+            'title': item['title'],
+            'content_text': item['description'],
+            'date_published': item['pubdate'].isoformat(),
+            'date_modified': item['updateddate'].isoformat(),
+            'authors': [{'name': item['author_name']}],
+            'tags': list(item['categories']),
+        }
+
+
+FEED_TYPES = {
+    'rss': Rss201rev2Feed,
+    'atom': Atom1Feed,
+    'json': JsonFeed,
+}
+
+
+def build_feed(request, kind, category):
+    # The body is cached for FEED_CACHE_TIMEOUT, so it is built from the
+    # primary: a lagging replica could still miss the write behind a bump.
+    posts = Post.objects.using(DEFAULT_DB_ALIAS).filter(status='published').for_list().order_by('-created_at')
+    if category is not None:
+        category = Category.objects.using(DEFAULT_DB_ALIAS).only(
+            'pk', 'name', 'description'
+        ).filter(pk=category.pk).first() or category
+        posts = posts.filter(category=category)
+        title, description = f'{category.name} posts', category.description or category.name
+    else:
+        title, description = 'Latest posts', 'Latest published posts'
+
+    feed = FEED_TYPES[kind](
+        title=title,
+        link=request.build_absolute_uri('/'),
+        description=description,
+        feed_url=request.build_absolute_uri(),
+        language=settings.LANGUAGE_CODE,
+    )
+    last_modified = None
+    for post in posts[:settings.FEED_ITEM_LIMIT]:
+        url = request.build_absolute_uri(post.get_absolute_url())
+        feed.add_item(
+            title=post.title,
+            link=url,
+            description=post.excerpt,
+            unique_id=url,
+            author_name=post.author.username,
+            pubdate=post.created_at,
+            updateddate=post.updated_at,
+            categories=[post.category.name] if post.category else (),
+        )
+        if last_modified is None or post.updated_at > last_modified:
+            last_modified = post.updated_at
+
+    body = feed.writeString('utf-8').encode()
+    return {
+        'body': body,
+        'content_type': feed.content_type,
+        'etag': quote_etag(hashlib.md5(body).hexdigest()),
+        'last_modified': int(last_modified.timestamp()) if last_modified else None,
+    }
+
+
+def get_feed(request, kind, category=None):
+    group = feed_group(category.pk if category else None)
+    versions = '.'.join(str(version) for version in get_versions([ALL_FEEDS_GROUP, group]))
+    host = hashlib.md5(request.get_host().encode()).hexdigest()
+    key = f'feed:{kind}:{group}:{versions}:{host}'
+
+    entry = cache.get(key)
+    if entry is None:
+        entry = build_feed(request, kind, category)
+        cache.set(key, entry, timeout=settings.FEED_CACHE_TIMEOUT)
+    return entry
+
+
+def feed_response(request, entry):
+    response = get_conditional_response(
+        request, etag=entry['etag'], last_modified=entry['last_modified'],
+    )
+    if response is None:
+        response = HttpResponse(entry['body'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    if entry['last_modified'] is not None:
+        response['Last-Modified'] = http_date(entry['last_modified'])
+    response['Cache-Control'] = f'public, max-age={settings.FEED_MAX_AGE}'
+    return response
+
+
+@transaction.non_atomic_requests
+@require_safe
+def site_feed(request, kind):
+    if kind not in FEED_TYPES:
+        raise Http404
+    return feed_response(request, get_feed(request, kind))
+
+
+@transaction.non_atomic_requests
+@require_safe
+def category_feed(request, category_slug, kind):
+    if kind not in FEED_TYPES:
+        raise Http404
+    category = get_object_or_404(Category.objects.only('pk', 'name', 'description'), slug=category_slug)
+    return feed_response(request, get_feed(request, kind, category))
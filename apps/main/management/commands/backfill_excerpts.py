@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+
+from apps.main.models import Post, excerpt_expression
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored excerpt of every post'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        updated = 0
+        for start in range(0, last_id, batch_size):
+            updated += Post.objects.filter(pk__gt=start, pk__lte=start + batch_size).update(
+                excerpt=excerpt_expression()
+            )
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated} excerpts'))
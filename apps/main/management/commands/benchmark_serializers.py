@@ -0,0 +1,58 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from apps.comments.models import Comment
+from apps.comments.serializers import CommentSerializer, CommentValuesSerializer
+from apps.main.models import Post
+from apps.main.serializers import PostListSerializer, PostListValuesSerializer
+
+
+def model_path(serializer_class, queryset, context):
+    return lambda: serializer_class(list(queryset), many=True, context=context).data
+
+
+def values_path(serializer_class, queryset, context):
+    def run():
+        serializer = serializer_class(context=context)
+        return serializer.many(list(serializer.values(queryset)))
+    return run
+
+
+class Command(BaseCommand):
+    help = 'Compare ModelSerializer and values() serialization throughput on list pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help='Rows per page')
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        context = {'request': RequestFactory().get('/api/v1/posts/')}
+        cases = [
+            ('posts', PostListSerializer, PostListValuesSerializer,
+             Post.objects.for_list().order_by('-created_at')[:rows],
+             Post.objects.order_by('-created_at')[:rows]),
+            ('comments', CommentSerializer, CommentValuesSerializer,
+             Comment.objects.select_related('author').order_by('-created_at')[:rows],
+             Comment.objects.order_by('-created_at')[:rows]),
+        ]
+        for name, model_class, values_class, model_queryset, values_queryset in cases:
+            before = model_path(model_class, model_queryset, context)
+            after = values_path(values_class, values_queryset, context)
+            if json.dumps(before()) != json.dumps(after()):
+                raise CommandError(f'{name}: values() output differs from {model_class.__name__}')
+
+            results = []
+            for run in (before, after):
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    count = len(run())
+                elapsed = time.perf_counter() - started
+                results.append(count * repeat / elapsed if elapsed else 0)
+            self.stdout.write(
+                f'{name}: {count} rows/page, ModelSerializer {results[0]:.0f} rows/s, '
+                f'values() {results[1]:.0f} rows/s ({results[1] / max(results[0], 1):.1f}x)'
+            )
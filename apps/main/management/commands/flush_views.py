@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.main.counters import flush_views, get_view_counter
+
+
+class Command(BaseCommand):
+    help = 'Write buffered post views to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep flushing every VIEW_COUNTER_FLUSH_INTERVAL seconds',
+        )
+        parser.add_argument(
+            '--interval', type=int, default=settings.VIEW_COUNTER_FLUSH_INTERVAL,
+        )
+
+    def handle(self, *args, **options):
+        if not get_view_counter().store.shared:
+            raise CommandError(
+                'VIEW_COUNTER_STORE keeps views in each web process, so there is nothing to flush '
+                'from here. Use apps.main.counters.CacheViewStore on a shared cache (Redis, Memcached).'
+            )
+        while True:
+            flushed = flush_views()
+            self.stdout.write(f'Flushed {flushed} views')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
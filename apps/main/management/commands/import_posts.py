@@ -0,0 +1,181 @@
+import csv
+import json
+import time
+from datetime import datetime
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from apps.accounts.models import User
+from apps.core.cache import bump_versions
+from apps.main.feeds import ALL_FEEDS_GROUP
+from apps.main.sitemaps import ALL_SITEMAPS_GROUP
+from apps.main.models import Category, Post, make_excerpt
+from apps.main.slugs import allocate_slugs
+
+
+def read_jsonl(handle):
+    for line in handle:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as exc:
+                # Still one record, so --offset positions stay stable.
+                yield exc
+
+
+def read_csv(handle):
+    yield from csv.DictReader(handle)
+
+
+STATUSES = {value for value, _ in Post.STATUS_CHOICES}
+
+READERS = {
+    'jsonl': read_jsonl,
+    'csv': read_csv,
+}
+
+
+def parse_datetime(value):
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = 'Stream posts from a JSONL or CSV file into the database in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=sorted(READERS), help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--offset', type=int, default=0, help='Skip this many records (resume)')
+        parser.add_argument('--create-categories', action='store_true')
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if file_format not in READERS:
+            raise CommandError(f'Unknown format "{file_format}", use --format')
+
+        self.authors = self.load_authors()
+        self.categories = self.load_categories()
+        self.create_categories = options['create_categories']
+        chunk_size = options['chunk_size']
+        position = options['offset']
+        imported = skipped = 0
+        started = time.monotonic()
+
+        with open(options['path'], newline='', encoding='utf-8') as handle:
+            records = islice(READERS[file_format](handle), position, None)
+            while True:
+                chunk = list(islice(records, chunk_size))
+                if not chunk:
+                    break
+                created, rejected = self.import_chunk(chunk, position)
+                imported += created
+                skipped += rejected
+                position += len(chunk)
+                rate = imported / max(time.monotonic() - started, 1e-6)
+                self.stdout.write(
+                    f'offset={position} imported={imported} skipped={skipped} rate={rate:.0f} posts/s'
+                )
+
+        bump_versions('posts', 'categories', ALL_FEEDS_GROUP, ALL_SITEMAPS_GROUP)
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} posts, skipped {skipped}. Resume with --offset {position}'
+        ))
+
+    def load_authors(self):
+        authors = {}
+        for pk, email, username in User.objects.values_list('pk', 'email', 'username').iterator():
+            authors[email.lower()] = pk
+            authors[username.lower()] = pk
+        return authors
+
+    def load_categories(self):
+        categories = {}
+        for pk, slug, name in Category.objects.values_list('pk', 'slug', 'name'):
+            categories[slug] = pk
+            categories[name.lower()] = pk
+        return categories
+
+    def resolve_category(self, value):
+        if not value:
+            return None
+        key = value.strip()
+        category_id = self.categories.get(key) or self.categories.get(key.lower())
+        if category_id is None and self.create_categories:
+            slug = slugify(key)
+            if not slug:
+                raise ValueError(f'no slug for category {key!r}')
+            # Names that slugify alike share one category.
+            category, _ = Category.objects.get_or_create(slug=slug, defaults={'name': key})
+            category_id = self.categories[slug] = self.categories[key.lower()] = category.pk
+        return category_id
+
+    def build_post(self, record):
+        # None for records that are rejected; malformed ones raise
+        # ValueError, TypeError or AttributeError.
+        if isinstance(record, Exception):
+            raise record
+        if not isinstance(record, dict):
+            raise ValueError('not an object')
+        author_id = self.authors.get((record.get('author') or '').strip().lower())
+        status = record.get('status') or 'published'
+        if author_id is None or not record.get('title') or status not in STATUSES:
+            return None
+        views_count = int(record.get('views_count') or 0)
+        if views_count < 0:
+            raise ValueError(f'negative views_count {views_count}')
+        created_at = parse_datetime(record.get('created_at'))
+        content = record.get('content') or ''
+        post = Post(
+            title=record['title'][:200],
+            slug=record.get('slug') or '',
+            content=content,
+            excerpt=make_excerpt(content),
+            author_id=author_id,
+            category_id=self.resolve_category(record.get('category')),
+            status=status,
+            views_count=views_count,
+        )
+        post.imported_created_at = created_at
+        return post
+
+    def build_posts(self, chunk, position):
+        posts = []
+        for number, record in enumerate(chunk, position + 1):
+            try:
+                post = self.build_post(record)
+            except (AttributeError, TypeError, ValueError) as exc:
+                self.stderr.write(f'Skipped malformed record {number}: {exc}')
+                continue
+            if post is not None:
+                posts.append(post)
+        return posts
+
+    @transaction.atomic
+    def import_chunk(self, chunk, position):
+        posts = self.build_posts(chunk, position)
+        # Supplied slugs go through the allocator too, so a clash with an
+        # existing post gets a suffix instead of failing the whole chunk.
+        for post, slug in zip(posts, allocate_slugs([post.slug or post.title for post in posts])):
+            post.slug = slug
+
+        Post.objects.bulk_create(posts)
+
+        # auto_now_add overwrites created_at on insert, so restore archive
+        # dates with one batched UPDATE.
+        dated = [post for post in posts if post.imported_created_at and post.pk]
+        for post in dated:
+            post.created_at = post.updated_at = post.imported_created_at
+        if dated:
+            Post.objects.bulk_update(dated, ['created_at', 'updated_at'])
+        return len(posts), len(chunk) - len(posts)
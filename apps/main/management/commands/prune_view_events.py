@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.main.analytics import prune_view_events
+
+
+class Command(BaseCommand):
+    help = 'Delete raw post view events older than the retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.VIEW_EVENT_RETENTION_DAYS)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        deleted = prune_view_events(days=options['days'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} view events'))
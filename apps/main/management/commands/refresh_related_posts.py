@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apps.main.related import refresh_related
+
+
+class Command(BaseCommand):
+    help = 'Recompute related posts for posts saved since the last run (or all of them with --full)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild every list from scratch')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        refreshed, written = refresh_related(full=options['full'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed related posts for {refreshed} posts ({written} rows)'
+        ))
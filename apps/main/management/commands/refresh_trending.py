@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from apps.main.trending import refresh_trending
+
+
+class Command(BaseCommand):
+    help = 'Recalculate trending scores for recently published posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        refreshed, removed = refresh_trending(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed {refreshed} trending posts, removed {removed}'
+        ))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:28
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_comments_count(apps, schema_editor):
+    Post = apps.get_model('main', 'Post')
+    Comment = apps.get_model('comments', 'Comment')
+    active = (Comment.objects.filter(post=OuterRef('pk'), is_active=True)
+              .order_by().values('post').annotate(total=Count('pk')).values('total'))
+    Post.objects.update(comments_count=Coalesce(Subquery(active), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+        ('comments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_comments_count, migrations.RunPython.noop),
+    ]
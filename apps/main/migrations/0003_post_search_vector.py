@@ -0,0 +1,62 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:31
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+# Title is weighted 'A' and content 'B', so title matches rank higher.
+CREATE_TRIGGER = """
+CREATE FUNCTION post_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.content, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER post_search_vector_trigger
+BEFORE INSERT OR UPDATE OF title, content ON post
+FOR EACH ROW EXECUTE FUNCTION post_search_vector_update();
+
+UPDATE post SET search_vector =
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(content, '')), 'B');
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS post_search_vector_trigger ON post;
+DROP FUNCTION IF EXISTS post_search_vector_update();
+"""
+
+
+def create_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_TRIGGER)
+
+
+def drop_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_TRIGGER)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_post_comments_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='post_search_vector_gin'),
+        ),
+        migrations.RunPython(create_trigger, drop_trigger),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_post_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingPost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('refreshed_at', models.DateTimeField()),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='main.category')),
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='trending', to='main.post')),
+            ],
+            options={
+                'verbose_name': 'Trending Post',
+                'verbose_name_plural': 'Trending Posts',
+                'db_table': 'trending_posts',
+                'ordering': ['-score'],
+                'indexes': [models.Index(fields=['-score'], name='trending_po_score_f2d2ee_idx'), models.Index(fields=['category', '-score'], name='trending_po_categor_a55c30_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedPost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('computed_at', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_posts', to='main.post')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_by', to='main.post')),
+            ],
+            options={
+                'verbose_name': 'Related Post',
+                'verbose_name_plural': 'Related Posts',
+                'db_table': 'related_posts',
+                'ordering': ['post', '-score'],
+                'indexes': [models.Index(fields=['post', '-score'], name='related_pos_post_id_2b99e7_idx'), models.Index(fields=['computed_at'], name='related_pos_compute_238197_idx')],
+                'constraints': [models.UniqueConstraint(fields=('post', 'related'), name='unique_related_post')],
+            },
+        ),
+    ]
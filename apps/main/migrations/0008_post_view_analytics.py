@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_related_post'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostDailyViews',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_views', to='main.post')),
+            ],
+            options={
+                'verbose_name': 'Post Daily Views',
+                'verbose_name_plural': 'Post Daily Views',
+                'db_table': 'post_daily_views',
+                'ordering': ['post', 'date'],
+                'constraints': [models.UniqueConstraint(fields=('post', 'date'), name='unique_post_daily_views')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PostViewEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('viewed_at', models.DateTimeField()),
+                ('views', models.PositiveIntegerField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_events', to='main.post')),
+            ],
+            options={
+                'verbose_name': 'Post View Event',
+                'verbose_name_plural': 'Post View Events',
+                'db_table': 'post_view_events',
+                'indexes': [models.Index(fields=['viewed_at'], name='post_view_e_viewed__b529c7_idx')],
+            },
+        ),
+    ]
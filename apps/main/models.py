@@ -1,14 +1,32 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Concat, Length, Substr
+from django.db.models.lookups import GreaterThan
 from django.conf import settings
 from django.utils.text import slugify
 from django.urls import reverse
 
+from apps.core.cache import bump_versions_on_commit
+from apps.core.images import schedule_variants
+from .slugs import allocate_slug
+
+class CategoryQuerySet(models.QuerySet):
+    def with_posts_count(self):
+        return self.annotate(
+            published_posts_count=Count('posts', filter=Q(posts__status='published'))
+        )
+
+
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=100, unique=True, blank=True)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CategoryQuerySet.as_manager()
+
     class Meta:
         db_table = 'category'
         verbose_name = 'Category'
@@ -23,6 +41,31 @@ class Category(models.Model):
             self.slug = slugify(self.name)
         super().save(*args, **kwargs)
 
+EXCERPT_LENGTH = 200
+
+
+def make_excerpt(content):
+    if len(content) > EXCERPT_LENGTH:
+        return content[:EXCERPT_LENGTH] + '...'
+    return content
+
+
+def excerpt_expression():
+    # Database-side make_excerpt(), used to backfill without loading content.
+    return Case(
+        When(GreaterThan(Length('content'), EXCERPT_LENGTH),
+             then=Concat(Substr('content', 1, EXCERPT_LENGTH), Value('...'))),
+        default=F('content'),
+        output_field=models.TextField(),
+    )
+
+
+class PostQuerySet(models.QuerySet):
+    def for_list(self):
+        # List pages only show the stored excerpt, so skip the large columns.
+        return self.select_related('author', 'category').defer('content', 'search_vector')
+
+
 class Post(models.Model):
     STATUS_CHOICES = (
         ('draft', 'Draft'),
@@ -33,12 +76,19 @@ class Post(models.Model):
     slug = models.SlugField(max_length=200, unique=True, blank=True)
     content = models.TextField()
     image = models.ImageField(upload_to='posts', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='posts')
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='posts')
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='published')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     views_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH + 3, blank=True, editable=False)
+    # Maintained by a database trigger on PostgreSQL, see apps/main/search.py
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         db_table = 'post'
@@ -50,23 +100,172 @@ class Post(models.Model):
             models.Index(fields=['status', '-created_at']),
             models.Index(fields=['category', '-created_at']),
             models.Index(fields=['author', '-created_at']),
+            GinIndex(fields=['search_vector'], name='post_search_vector_gin'),
         ]
 
     def __str__(self):
         return self.title
 
+    SLUG_ATTEMPTS = 3
+    # Only ever changed with F() updates, so a full save must not write the
+    # in-memory copies back over increments made since the row was loaded.
+    COUNTER_FIELDS = ('views_count', 'comments_count')
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.title)
-        super().save(*args, **kwargs)
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS and field.attname not in deferred
+            ]
+        if 'content' not in self.get_deferred_fields():
+            self.excerpt = make_excerpt(self.content)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'content' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'excerpt'}
+        image_loaded = 'image' not in self.get_deferred_fields()
+        if image_loaded and not self.image and self.image_variants:
+            self.image_variants = {}
+        if self.slug:
+            super().save(*args, **kwargs)
+        else:
+            self._save_with_new_slug(*args, **kwargs)
+        if image_loaded:
+            schedule_variants(self, 'image', 'image_variants')
+
+    def _save_with_new_slug(self, *args, **kwargs):
+        # A concurrent insert can claim the same slug between allocation and
+        # INSERT; retry inside a savepoint so the outer transaction survives.
+        for attempt in range(self.SLUG_ATTEMPTS):
+            self.slug = allocate_slug(self.title, exclude_pk=self.pk)
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError:
+                taken = Post.objects.filter(slug=self.slug).exclude(pk=self.pk).exists()
+                if attempt == self.SLUG_ATTEMPTS - 1 or not taken:
+                    raise
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets feed invalidation also refresh the category a post left.
+        if 'category_id' in field_names:
+            instance._loaded_category_id = values[field_names.index('category_id')]
+        return instance
 
     def get_absolute_url(self):
         return reverse('post-detail', kwargs={'slug': self.slug})
 
-    @property
-    def comments_count(self):
-        return self.comments.filter(is_active=True).count()
+    @classmethod
+    def adjust_comments_count(cls, post_id, delta):
+        cls.objects.filter(pk=post_id).update(comments_count=F('comments_count') + delta)
+
+    @classmethod
+    def recount_comments(cls, post_ids=None):
+        from apps.comments.models import Comment
+
+        active = (Comment.objects.filter(post=OuterRef('pk'), is_active=True)
+                  .order_by().values('post').annotate(total=Count('pk')).values('total'))
+        queryset = cls.objects.all()
+        if post_ids is not None:
+            queryset = queryset.filter(pk__in=post_ids)
+        updated = queryset.update(comments_count=Coalesce(Subquery(active), 0))
+        # update() sends no post_save.
+        bump_versions_on_commit('posts')
+        return updated
 
     def increment_views(self):
+        from .counters import record_view
+
+        # The stored counter is bumped in batches by the view buffer; only
+        # the in-memory copy is updated so the response reflects this hit.
+        record_view(self.pk)
+        self.views_count += 1
+
+    async def aincrement_views(self):
+        from .counters import arecord_view
+
+        await arecord_view(self.pk)
         self.views_count += 1
-        self.save(update_fields=['views_count'])
\ No newline at end of file
+
+class TrendingPost(models.Model):
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, related_name='trending')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    score = models.FloatField()
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'trending_posts'
+        verbose_name = 'Trending Post'
+        verbose_name_plural = 'Trending Posts'
+        ordering = ['-score']
+        indexes = [
+            models.Index(fields=['-score']),
+            models.Index(fields=['category', '-score']),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id}: {self.score:.4f}'
+
+
+class RelatedPost(models.Model):
+    # Precomputed content neighbours, see apps/main/related.py
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='related_posts')
+    related = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='related_by')
+    score = models.FloatField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'related_posts'
+        verbose_name = 'Related Post'
+        verbose_name_plural = 'Related Posts'
+        ordering = ['post', '-score']
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'related'], name='unique_related_post'),
+        ]
+        indexes = [
+            models.Index(fields=['post', '-score']),
+            models.Index(fields=['computed_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id} -> {self.related_id}: {self.score:.4f}'
+
+
+class PostViewEvent(models.Model):
+    # Hits per post and minute, written by the view counter flush and
+    # pruned after VIEW_EVENT_RETENTION_DAYS, see apps/main/analytics.py
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='view_events')
+    viewed_at = models.DateTimeField()
+    views = models.PositiveIntegerField()
+
+    class Meta:
+        db_table = 'post_view_events'
+        verbose_name = 'Post View Event'
+        verbose_name_plural = 'Post View Events'
+        indexes = [
+            models.Index(fields=['viewed_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id} @ {self.viewed_at:%Y-%m-%d %H:%M}: {self.views}'
+
+
+class PostDailyViews(models.Model):
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='daily_views')
+    date = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'post_daily_views'
+        verbose_name = 'Post Daily Views'
+        verbose_name_plural = 'Post Daily Views'
+        ordering = ['post', 'date']
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'date'], name='unique_post_daily_views'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id} on {self.date}: {self.views}'
@@ -0,0 +1,185 @@
+import math
+import re
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q
+from django.utils import timezone
+
+from apps.core.cache import bump_versions
+from .models import Post, RelatedPost
+
+TOKEN_RE = re.compile(r'[^\W\d_]{2,}')
+STOP_WORDS = frozenset('''
+    about after all also an and any are as at be been but by can could did do does for from had has
+    have he her him his how if in into is it its just like may more most no not of on one only or
+    our out over she so some than that the their them then there these they this to up was we
+    were what when which who will with would you your
+'''.split())
+# Upper bound on both the size of one similarity block (queries x posts)
+# and the postings expanded to fill it, so memory stays flat however large
+# the corpus grows.
+SCORE_CELLS = 1 << 22
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def term_counts(title, content):
+    counts = Counter(tokenize(content))
+    for token in tokenize(title):
+        counts[token] += settings.RELATED_TITLE_WEIGHT
+    return counts
+
+
+class TfidfIndex:
+    # L2-normalised TF-IDF rows in CSR form plus the same weights grouped
+    # by term (an inverted index), so a block of rows is scored against
+    # every post with one bincount over the postings of their terms.
+    def __init__(self, documents):
+        self.size = len(documents)
+        frequencies = Counter(term for counts in documents for term in counts)
+        max_df = settings.RELATED_MAX_DF * self.size
+        terms = [term for term, frequency in frequencies.most_common(settings.RELATED_MAX_TERMS)
+                 if settings.RELATED_MIN_DF <= frequency <= max_df]
+        vocabulary = {term: index for index, term in enumerate(terms)}
+        idf = np.array([math.log((1 + self.size) / (1 + frequencies[term])) + 1 for term in terms])
+
+        indptr, indices, tfs = [0], [], []
+        for counts in documents:
+            for term, count in counts.items():
+                index = vocabulary.get(term)
+                if index is not None:
+                    indices.append(index)
+                    tfs.append(count)
+            indptr.append(len(indices))
+        self.indptr = np.array(indptr, dtype=np.int64)
+        self.indices = np.array(indices, dtype=np.int64)
+        rows = np.repeat(np.arange(self.size), np.diff(self.indptr))
+        weights = (1 + np.log(np.array(tfs, dtype=np.float64))) * idf[self.indices]
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=self.size))
+        self.weights = weights / norms[rows]
+
+        order = np.argsort(self.indices, kind='stable')
+        self.posting_rows = rows[order]
+        self.posting_weights = self.weights[order]
+        self.term_ptr = np.searchsorted(self.indices[order], np.arange(len(terms) + 1))
+        # Postings scores() expands for each row: the document frequency
+        # of every term it has.
+        self.row_postings = np.bincount(rows, weights=np.diff(self.term_ptr)[self.indices], minlength=self.size)
+
+    def batches(self, rows):
+        # A row whose postings alone exceed the bound gets a batch of its own.
+        max_rows = max(1, SCORE_CELLS // max(self.size, 1))
+        start = 0
+        while start < len(rows):
+            postings = np.cumsum(self.row_postings[rows[start:start + max_rows]])
+            size = max(1, int(np.searchsorted(postings, SCORE_CELLS, side='right')))
+            yield rows[start:start + size]
+            start += size
+
+    def scores(self, rows):
+        # Cosine similarity of `rows` against every row: (len(rows), size).
+        rows = np.asarray(rows, dtype=np.int64)
+        lengths = self.indptr[rows + 1] - self.indptr[rows]
+        positions = np.repeat(self.indptr[rows] - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        terms = self.indices[positions]
+        query = np.repeat(np.arange(len(rows)), lengths)
+
+        starts = self.term_ptr[terms]
+        counts = self.term_ptr[terms + 1] - starts
+        postings = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        cells = np.repeat(query, counts) * self.size + self.posting_rows[postings]
+        values = np.repeat(self.weights[positions], counts) * self.posting_weights[postings]
+        scores = np.bincount(cells, weights=values, minlength=len(rows) * self.size).reshape(len(rows), self.size)
+        scores[np.arange(len(rows)), rows] = 0
+        return scores
+
+    def neighbours(self, rows, k):
+        # Yields (row, [(other row, score), ...]) with the best k first.
+        k = min(k, self.size - 1)
+        if k < 1:
+            return
+        for batch in self.batches(rows):
+            scores = self.scores(batch)
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            for row, candidates, row_scores in zip(batch, top, scores):
+                candidates = candidates[np.argsort(-row_scores[candidates], kind='stable')]
+                yield row, [(int(other), float(row_scores[other])) for other in candidates
+                            if row_scores[other] >= settings.RELATED_MIN_SCORE]
+
+
+def refresh_related(full=False, batch_size=1000):
+    # Incremental runs recompute posts saved since the last run, plus every
+    # post whose list they now enter or already appear in. Changed
+    # document frequencies only reach the other posts on a --full run.
+    started = timezone.now()
+    since = None
+    if not full:
+        since = RelatedPost.objects.aggregate(latest=Max('computed_at'))['latest']
+
+    post_ids, documents, stale = [], [], []
+    published = Post.objects.filter(status='published').order_by('pk').values_list(
+        'pk', 'title', 'content', 'updated_at'
+    )
+    for row, (post_id, title, content, updated_at) in enumerate(published.iterator(chunk_size=batch_size)):
+        post_ids.append(post_id)
+        documents.append(term_counts(title, content))
+        if since is None or updated_at > since:
+            stale.append(row)
+
+    index = TfidfIndex(documents)
+    targets = stale if since is None else sorted(set(stale) | affected_rows(index, post_ids, stale))
+    k = settings.RELATED_POSTS_COUNT
+
+    with transaction.atomic():
+        if since is None:
+            RelatedPost.objects.all().delete()
+        else:
+            RelatedPost.objects.exclude(post__status='published').delete()
+            target_ids = [post_ids[row] for row in targets]
+            for start in range(0, len(target_ids), batch_size):
+                RelatedPost.objects.filter(post_id__in=target_ids[start:start + batch_size]).delete()
+
+        batch, written = [], 0
+        for row, neighbours in index.neighbours(targets, k):
+            batch += [
+                RelatedPost(post_id=post_ids[row], related_id=post_ids[other], score=score, computed_at=started)
+                for other, score in neighbours
+            ]
+            if len(batch) >= batch_size:
+                written += len(RelatedPost.objects.bulk_create(batch))
+                batch = []
+        written += len(RelatedPost.objects.bulk_create(batch))
+    bump_versions('posts')
+    return len(targets), written
+
+
+def affected_rows(index, post_ids, stale):
+    positions = {post_id: row for row, post_id in enumerate(post_ids)}
+    stale_ids = [post_ids[row] for row in stale]
+    # Posts listing a changed or unpublished post may need to drop or
+    # reorder it.
+    listing = RelatedPost.objects.filter(Q(related_id__in=stale_ids) | ~Q(related__status='published'))
+    affected = {positions[post_id] for post_id in listing.values_list('post_id', flat=True)
+                if post_id in positions}
+    if not stale:
+        return affected
+
+    # A post's list takes a new neighbour that beats its current last one.
+    thresholds = np.full(index.size, settings.RELATED_MIN_SCORE)
+    lists = RelatedPost.objects.values('post_id').annotate(total=Count('pk'), lowest=Min('score'))
+    for row in lists:
+        if row['post_id'] in positions and row['total'] >= settings.RELATED_POSTS_COUNT:
+            thresholds[positions[row['post_id']]] = row['lowest']
+    for batch in index.batches(stale):
+        scores = index.scores(batch)
+        affected.update(np.flatnonzero((scores > thresholds).any(axis=0)).tolist())
+    return affected
+
+
+def related_posts(post):
+    return Post.objects.filter(related_by__post=post, status='published').order_by('-related_by__score')
@@ -0,0 +1,198 @@
+import math
+import re
+import threading
+from collections import defaultdict
+
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import Case, CharField, Count, F, FloatField, Max, Value, When
+from django.db.models.functions import Replace
+from django.utils.html import escape
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+# Must match the configuration used by the trigger in migration 0003.
+SEARCH_CONFIG = 'english'
+TITLE_WEIGHT = 1.0
+CONTENT_WEIGHT = 0.4
+HEADLINE_WORDS = 35
+
+STOP_WORDS = frozenset(
+    'a an and are as at be by for from has he in is it its of on or that the '
+    'to was were will with'.split()
+)
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+# What django.utils.html.escape() replaces, ampersand first.
+HTML_ESCAPES = (('&', '&amp;'), ('<', '&lt;'), ('>', '&gt;'), ('"', '&quot;'), ("'", '&#x27;'))
+
+
+def stem(token):
+    # Crude plural folding so 'elections' finds 'election', close enough
+    # to the PostgreSQL stemmer for the fallback's purposes.
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    return [stem(token) for token in TOKEN_RE.findall((text or '').lower())
+            if token not in STOP_WORDS]
+
+
+def parse_query(terms):
+    include, exclude = [], []
+    for term in terms.split():
+        target = exclude if term.startswith('-') else include
+        target.extend(tokenize(term))
+    return include, exclude
+
+
+def escaped_html(expression):
+    for char, entity in HTML_ESCAPES:
+        expression = Replace(expression, Value(char), Value(entity))
+    return expression
+
+
+class PostgresSearchBackend:
+    def search(self, queryset, terms):
+        query = SearchQuery(terms, search_type='websearch', config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query),
+            # Headlines are HTML: the content is escaped before the <b>
+            # tags go in.
+            search_headline=SearchHeadline(
+                escaped_html(F('content')), query, config=SEARCH_CONFIG,
+                max_words=HEADLINE_WORDS, min_words=HEADLINE_WORDS // 2,
+            ),
+        )
+
+
+class InvertedIndex:
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        self.contents = {}
+
+    def add(self, post_id, title, content):
+        scores = defaultdict(float)
+        for text, weight in ((title, TITLE_WEIGHT), (content, CONTENT_WEIGHT)):
+            frequencies = defaultdict(int)
+            for token in tokenize(text):
+                frequencies[token] += 1
+            for token, frequency in frequencies.items():
+                # Saturates at twice the field weight, so repeating a word
+                # in the content never outweighs having it in the title.
+                scores[token] += weight * 2 * frequency / (frequency + 1)
+        for token, score in scores.items():
+            self.postings[token][post_id] = score
+        self.contents[post_id] = content
+
+    def search(self, include, exclude):
+        if not include:
+            return {}
+        matches = None
+        for token in include:
+            found = set(self.postings.get(token, ()))
+            matches = found if matches is None else matches & found
+            if not matches:
+                return {}
+        for token in exclude:
+            matches -= set(self.postings.get(token, ()))
+
+        total = len(self.contents)
+        ranks = {}
+        for post_id in matches:
+            ranks[post_id] = sum(
+                self.postings[token][post_id] * math.log(1 + total / len(self.postings[token]))
+                for token in include
+            )
+        return ranks
+
+    def headline(self, post_id, include):
+        words = (self.contents.get(post_id) or '').split()
+        wanted = set(include)
+        start = 0
+        for position, word in enumerate(words):
+            if wanted.intersection(tokenize(word)):
+                start = max(0, position - HEADLINE_WORDS // 4)
+                break
+        snippet = words[start:start + HEADLINE_WORDS]
+        return ' '.join(
+            f'<b>{escape(word)}</b>' if wanted.intersection(tokenize(word)) else escape(word)
+            for word in snippet
+        )
+
+
+class InvertedIndexSearchBackend:
+    # Pure-Python fallback for databases without full-text search (SQLite
+    # test runs). The index lives in process memory and is rebuilt whenever
+    # the posts table has changed since it was built.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes = {}
+
+    def get_index(self, queryset):
+        from .models import Post
+
+        posts = Post.objects.using(queryset.db)
+        state = posts.aggregate(last=Max('updated_at'), total=Count('pk'))
+        with self._lock:
+            built = self._indexes.get(queryset.db)
+            if built is None or built[0] != state:
+                index = InvertedIndex()
+                rows = posts.values_list('pk', 'title', 'content').iterator(chunk_size=2000)
+                for post_id, title, content in rows:
+                    index.add(post_id, title, content)
+                built = (state, index)
+                self._indexes[queryset.db] = built
+        return built[1]
+
+    def search(self, queryset, terms):
+        include, exclude = parse_query(terms)
+        index = self.get_index(queryset)
+        ranks = index.search(include, exclude)
+        if not ranks:
+            return queryset.annotate(
+                search_rank=Value(0.0, output_field=FloatField()),
+                search_headline=Value('', output_field=CharField()),
+            ).none()
+        return queryset.filter(pk__in=list(ranks)).annotate(
+            search_rank=Case(
+                *[When(pk=post_id, then=Value(rank)) for post_id, rank in ranks.items()],
+                output_field=FloatField(),
+            ),
+            search_headline=Case(
+                *[When(pk=post_id, then=Value(index.headline(post_id, include)))
+                  for post_id in ranks],
+                output_field=CharField(),
+            ),
+        )
+
+
+postgres_backend = PostgresSearchBackend()
+fallback_backend = InvertedIndexSearchBackend()
+
+
+def get_search_backend(using):
+    if connections[using].vendor == 'postgresql':
+        return postgres_backend
+    return fallback_backend
+
+
+def search_posts(queryset, terms):
+    return get_search_backend(queryset.db).search(queryset, terms)
+
+
+class PostSearchFilter(filters.SearchFilter):
+    # Drop-in replacement for SearchFilter on posts: same `?search=`
+    # parameter, ranked by relevance unless `?ordering=` is given. Must be
+    # listed after OrderingFilter so the rank order wins.
+
+    def filter_queryset(self, request, queryset, view):
+        terms = ' '.join(self.get_search_terms(request))
+        if not terms:
+            return queryset
+        queryset = search_posts(queryset, terms)
+        if not request.query_params.get(api_settings.ORDERING_PARAM):
+            queryset = queryset.order_by('-search_rank', '-created_at')
+        return queryset
@@ -1,9 +1,13 @@
 from rest_framework import serializers
 from django.utils.text import slugify
+
+from apps.core.images import variant_urls
+from apps.core.serializers import SparseFieldsMixin, ValuesSerializer
 from .models import Category, Post
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     posts_count = serializers.SerializerMethodField()
+    field_annotations = {'posts_count': 'with_posts_count'}
 
     class Meta:
         model = Category
@@ -12,22 +16,27 @@ class CategorySerializer(serializers.ModelSerializer):
 
 
     def get_posts_count(self, obj):
+        if hasattr(obj, 'published_posts_count'):
+            return obj.published_posts_count
         return obj.posts.filter(status='published').count()
 
     def create(self, validated_data):
         validated_data['slug'] = slugify(validated_data['name'])
         return super().create(validated_data)
 
-class PostListSerializer(serializers.ModelSerializer):
+class PostListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = serializers.StringRelatedField()
     category = serializers.StringRelatedField()
     comments_count = serializers.ReadOnlyField()
+    content = serializers.CharField(source='excerpt', read_only=True)
+    image_variants = serializers.SerializerMethodField()
+    field_dependencies = {'image_variants': ('image', 'image_variants')}
 
     class Meta:
         model = Post
         fields = ['id', 'title',
                   'slug', 'content',
-                  'image', 'category',
+                  'image', 'image_variants', 'category',
                   'author', 'status',
                   'created_at', 'updated_at',
                   'views_count', 'comments_count'
@@ -35,22 +44,60 @@ class PostListSerializer(serializers.ModelSerializer):
 
         read_only_fields = ['slug', 'author', 'views_count']
 
+    def get_image_variants(self, obj):
+        return variant_urls(obj.image, obj.image_variants, self.context.get('request'))
+
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        if len(data['content']) > 200:
-            data['content'] = data['content'][:200] + '...'
+        if hasattr(instance, 'search_headline'):
+            data['search_headline'] = instance.search_headline
         return data
 
 
-class PostDetailSerializer(serializers.ModelSerializer):
+class PostListValuesSerializer(ValuesSerializer):
+    # values() twin of PostListSerializer for the list endpoints; the
+    # output must stay identical.
+    fields = (
+        ('id', 'id'),
+        ('title', 'title'),
+        ('slug', 'slug'),
+        ('content', 'excerpt'),
+        ('image', 'image'),
+        ('image_variants', 'image_variants'),
+        ('category', 'category__name'),
+        ('author', 'author__email'),
+        ('status', 'status'),
+        ('created_at', 'created_at', 'to_datetime'),
+        ('updated_at', 'updated_at', 'to_datetime'),
+        ('views_count', 'views_count'),
+        ('comments_count', 'comments_count'),
+    )
+    optional_annotations = ('search_headline',)
+    format_lookups = {'image_variants': ('image',)}
+    image_field = Post._meta.get_field('image')
+
+    def format_image(self, row):
+        return self.file_url(self.image_field, row['image'])
+
+    def format_image_variants(self, row):
+        return self.file_variants(self.image_field, row['image'], row['image_variants'])
+
+
+class PostDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author_info = serializers.SerializerMethodField()
     category_info = serializers.SerializerMethodField()
     comments_count = serializers.ReadOnlyField()
+    image_variants = serializers.SerializerMethodField()
+    field_dependencies = {
+        'author_info': ('author',),
+        'category_info': ('category',),
+        'image_variants': ('image', 'image_variants'),
+    }
 
     class Meta:
         model = Post
         fields = [
-            'id', 'title', 'slug', 'content', 'image', 'category',
+            'id', 'title', 'slug', 'content', 'image', 'image_variants', 'category',
             'category_info', 'author', 'author_info', 'status',
             'created_at', 'updated_at', 'views_count', 'comments_count',
 
@@ -63,9 +110,13 @@ class PostDetailSerializer(serializers.ModelSerializer):
             'id': author.id,
             'username': author.username,
             'full_name': author.full_name,
-            'avatar': author.avatar.url if author.avatar else None
+            'avatar': author.avatar.url if author.avatar else None,
+            'avatar_variants': variant_urls(author.avatar, author.avatar_variants),
         }
 
+    def get_image_variants(self, obj):
+        return variant_urls(obj.image, obj.image_variants, self.context.get('request'))
+
     def get_category_info(self, obj):
         if obj.category:
             return {
@@ -81,11 +132,11 @@ class PostCreateUpdateSerializer(serializers.ModelSerializer):
         fields = ['title', 'content', 'image', 'category', 'status']
 
     def create(self, validated_data):
+        # Post.save allocates a free slug for the title.
         validated_data['author'] = self.context['request'].user
-        validated_data['slug'] = slugify(validated_data['title'])
         return super().create(validated_data)
 
     def update(self, instance, validated_data):
-        if 'title' in validated_data:
-            validated_data['slug'] = slugify(validated_data['title'])
+        if 'title' in validated_data and validated_data['title'] != instance.title:
+            validated_data['slug'] = ''
         return super().update(instance, validated_data)
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .feeds import invalidate_feeds
+from .models import Category, Post
+from .sitemaps import invalidate_sitemaps
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, **kwargs):
+    invalidate_feeds(instance.category_id, getattr(instance, '_loaded_category_id', None))
+    instance._loaded_category_id = instance.category_id
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_sitemaps(sender, instance, **kwargs):
+    invalidate_sitemaps(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_feeds(sender, instance, **kwargs):
+    invalidate_feeds(instance.pk)
@@ -0,0 +1,139 @@
+import hashlib
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F, Max
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+from apps.core.cache import bump_versions_on_commit, get_versions
+from .models import Post
+
+# Post sitemaps hold fixed pk ranges of SITEMAP_CHUNK_SIZE, so a changed
+# post only invalidates the chunk its pk falls in (and the index).
+# ALL_SITEMAPS_GROUP is bumped by bulk writes that bypass model signals.
+ALL_SITEMAPS_GROUP = 'sitemaps'
+INDEX_GROUP = 'sitemaps:index'
+SLUG_PLACEHOLDER = 'sitemap-slug'
+CONTENT_TYPE = 'application/xml; charset=utf-8'
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def chunk_of(post_id):
+    return (post_id - 1) // settings.SITEMAP_CHUNK_SIZE
+
+
+def chunk_group(chunk):
+    return f'sitemaps:chunk:{chunk}'
+
+
+def invalidate_sitemaps(*post_ids):
+    bump_versions_on_commit(INDEX_GROUP, *{chunk_group(chunk_of(pk)) for pk in post_ids})
+
+
+def lastmod(value):
+    return value.isoformat(timespec='seconds')
+
+
+def cache_key(request, name, group):
+    versions = '.'.join(str(version) for version in get_versions([ALL_SITEMAPS_GROUP, group]))
+    host = hashlib.md5(request.get_host().encode()).hexdigest()
+    return f'sitemap:{name}:{versions}:{host}'
+
+
+def make_entry(body, last_modified):
+    return {
+        'body': body,
+        'etag': quote_etag(hashlib.md5(body).hexdigest()),
+        'last_modified': int(last_modified.timestamp()) if last_modified else None,
+    }
+
+
+def cached_response(request, entry):
+    response = get_conditional_response(
+        request, etag=entry['etag'], last_modified=entry['last_modified'],
+    )
+    if response is None:
+        response = HttpResponse(entry['body'], content_type=CONTENT_TYPE)
+    response['ETag'] = entry['etag']
+    if entry['last_modified'] is not None:
+        response['Last-Modified'] = http_date(entry['last_modified'])
+    response['Cache-Control'] = f'public, max-age={settings.SITEMAP_MAX_AGE}'
+    return response
+
+
+def published_posts():
+    # Bodies are cached for SITEMAP_CACHE_TIMEOUT, so they are built from
+    # the primary: a lagging replica could still miss the write behind a
+    # bump.
+    return Post.objects.using(DEFAULT_DB_ALIAS).filter(status='published').order_by()
+
+
+def build_index(request):
+    chunks = (published_posts().annotate(chunk=(F('pk') - 1) / settings.SITEMAP_CHUNK_SIZE)
+              .values('chunk').annotate(lastmod=Max('updated_at')).order_by('chunk'))
+    lines = [XML_HEADER, f'<sitemapindex xmlns="{XMLNS}">\n']
+    last_modified = None
+    for row in chunks:
+        url = escape(request.build_absolute_uri(reverse('sitemap-posts', args=[row['chunk']])))
+        lines.append(f'<sitemap><loc>{url}</loc><lastmod>{lastmod(row["lastmod"])}</lastmod></sitemap>\n')
+        if last_modified is None or row['lastmod'] > last_modified:
+            last_modified = row['lastmod']
+    lines.append('</sitemapindex>\n')
+    return make_entry(''.join(lines).encode(), last_modified)
+
+
+def stream_chunk(request, posts, key):
+    # Yields the urlset while it is read from a server-side cursor, and
+    # caches the finished body so the next request skips the query.
+    # reverse() runs once per chunk rather than once per post.
+    template = escape(request.build_absolute_uri(reverse('post-detail', kwargs={'slug': SLUG_PLACEHOLDER})))
+    parts, last_modified = [], None
+    head = f'{XML_HEADER}<urlset xmlns="{XMLNS}">\n'.encode()
+    parts.append(head)
+    yield head
+    for slug, updated_at in posts.values_list('slug', 'updated_at').iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        line = (f'<url><loc>{template.replace(SLUG_PLACEHOLDER, slug)}</loc>'
+                f'<lastmod>{lastmod(updated_at)}</lastmod></url>\n').encode()
+        parts.append(line)
+        if last_modified is None or updated_at > last_modified:
+            last_modified = updated_at
+        yield line
+    tail = b'</urlset>\n'
+    parts.append(tail)
+    yield tail
+    cache.set(key, make_entry(b''.join(parts), last_modified), timeout=settings.SITEMAP_CACHE_TIMEOUT)
+
+
+@transaction.non_atomic_requests
+@require_safe
+def sitemap_index(request):
+    key = cache_key(request, 'index', INDEX_GROUP)
+    entry = cache.get(key)
+    if entry is None:
+        entry = build_index(request)
+        cache.set(key, entry, timeout=settings.SITEMAP_CACHE_TIMEOUT)
+    return cached_response(request, entry)
+
+
+@transaction.non_atomic_requests
+@require_safe
+def sitemap_posts(request, chunk):
+    key = cache_key(request, f'posts:{chunk}', chunk_group(chunk))
+    entry = cache.get(key)
+    if entry is not None:
+        return cached_response(request, entry)
+
+    start = chunk * settings.SITEMAP_CHUNK_SIZE
+    posts = published_posts().filter(pk__gt=start, pk__lte=start + settings.SITEMAP_CHUNK_SIZE).order_by('pk')
+    if not posts.exists():
+        raise Http404
+    response = StreamingHttpResponse(stream_chunk(request, posts, key), content_type=CONTENT_TYPE)
+    response['Cache-Control'] = f'public, max-age={settings.SITEMAP_MAX_AGE}'
+    return response
@@ -0,0 +1,69 @@
+import re
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from django.utils.text import slugify
+
+SLUG_MAX_LENGTH = 200
+# Room for a '-<n>' suffix so a suffixed slug still fits the column.
+SUFFIX_RESERVE = 8
+BULK_QUERY_SIZE = 200
+
+
+def base_slug(title):
+    slug = slugify(title)[:SLUG_MAX_LENGTH - SUFFIX_RESERVE].strip('-')
+    return slug or 'post'
+
+
+def split_slug(slug):
+    base, _, suffix = slug.rpartition('-')
+    if base and suffix.isdigit():
+        return base, int(suffix)
+    return slug, 1
+
+
+def _queryset(exclude_pk):
+    from .models import Post
+
+    queryset = Post.objects.all()
+    if exclude_pk is not None:
+        queryset = queryset.exclude(pk=exclude_pk)
+    return queryset
+
+
+def _highest_suffixes(bases, exclude_pk=None):
+    # One range scan on the unique slug index per chunk of bases; the regex
+    # only rechecks rows the prefix already matched.
+    highest = {}
+    bases = sorted(bases)
+    for start in range(0, len(bases), BULK_QUERY_SIZE):
+        chunk = bases[start:start + BULK_QUERY_SIZE]
+        wanted = set(chunk)
+        condition = reduce(or_, (Q(slug__startswith=base) for base in chunk))
+        pattern = '^(%s)(-[0-9]+)?$' % '|'.join(re.escape(base) for base in chunk)
+        taken = _queryset(exclude_pk).filter(condition, slug__regex=pattern).order_by()
+        for slug in taken.values_list('slug', flat=True).iterator():
+            if slug in wanted:
+                highest[slug] = max(highest.get(slug, 0), 1)
+            base, suffix = split_slug(slug)
+            if suffix > 1 and base in wanted:
+                highest[base] = max(highest.get(base, 0), suffix)
+    return highest
+
+
+def _next_slug(base, highest):
+    used = highest.get(base, 0)
+    highest[base] = used + 1
+    return base if used == 0 else f'{base}-{used + 1}'
+
+
+def allocate_slug(title, exclude_pk=None):
+    base = base_slug(title)
+    return _next_slug(base, _highest_suffixes([base], exclude_pk))
+
+
+def allocate_slugs(titles):
+    bases = [base_slug(title) for title in titles]
+    highest = _highest_suffixes(set(bases))
+    return [_next_slug(base, highest) for base in bases]
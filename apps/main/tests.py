@@ -1,3 +1,446 @@
-from django.test import TestCase
+import json
+import tempfile
+import threading
+from collections import Counter
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from . import async_views
+from .counters import CacheViewStore, LocalViewStore, ViewCounter, view_key
+from .models import Category, Post, PostDailyViews, PostViewEvent
+from .related import TfidfIndex
+from .slugs import allocate_slug, allocate_slugs
+from .trending import refresh_trending
+
+
+def create_author(username='author'):
+    return User.objects.create_user(email=f'{username}@example.com', username=username, password='pass')
+
+
+class CacheViewStoreTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.store = CacheViewStore()
+
+    def test_concurrent_hits_are_not_lost(self):
+        keys = [(post_id, 1) for post_id in range(1, 6)]
+        drained = Counter()
+        done = threading.Event()
+
+        def hit(worker):
+            for _ in range(20):
+                self.store.add(keys[worker % len(keys)])
+
+        def drain():
+            while not done.is_set():
+                drained.update(self.store.drain())
+
+        drainer = threading.Thread(target=drain)
+        drainer.start()
+        workers = [threading.Thread(target=hit, args=(worker,)) for worker in range(50)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        done.set()
+        drainer.join()
+        drained.update(self.store.drain())
+
+        self.assertEqual(drained, {key: 200 for key in keys})
+        self.assertEqual(self.store.drain(), {})
+
+    def test_restore_puts_hits_back(self):
+        self.store.add((1, 1), 3)
+        pending = self.store.drain()
+        self.store.restore(pending)
+        self.assertEqual(self.store.drain(), {(1, 1): 3})
+
+    def test_locmem_cache_is_not_shared(self):
+        self.assertFalse(self.store.shared)
+
+
+class ViewCounterTests(TestCase):
+    def setUp(self):
+        self.post = Post.objects.create(title='Counted', content='body', author=create_author())
+        self.counter = ViewCounter(LocalViewStore(), flush_interval=3600, max_pending=1000)
+
+    def test_flush_writes_buffered_views(self):
+        for _ in range(3):
+            self.counter.store.add(view_key(self.post.pk))
+
+        self.assertEqual(self.counter.flush(), 3)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 3)
+        self.assertEqual(PostDailyViews.objects.get(post=self.post).views, 3)
+        self.assertEqual(PostViewEvent.objects.get(post=self.post).views, 3)
+        self.assertEqual(self.counter.flush(), 0)
+
+    def test_failed_flush_restores_views(self):
+        key = view_key(self.post.pk)
+        self.counter.store.add(key, 2)
+
+        with mock.patch('apps.main.counters.write_views', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.counter.flush()
+
+        self.assertEqual(self.counter.store.drain(), {key: 2})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 0)
+
+    def test_flush_command_needs_a_shared_store(self):
+        with self.assertRaises(CommandError):
+            call_command('flush_views')
+
+
+class PostSaveTests(TestCase):
+    def test_full_save_keeps_concurrent_counter_updates(self):
+        post = Post.objects.create(title='Counted', content='body', author=create_author())
+        Post.objects.filter(pk=post.pk).update(views_count=F('views_count') + 5)
+        Post.adjust_comments_count(post.pk, 2)
+
+        post.title = 'Renamed'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual((post.title, post.views_count, post.comments_count), ('Renamed', 5, 2))
+
+
+class TfidfIndexTests(SimpleTestCase):
+    def setUp(self):
+        words = ['alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta', 'theta', 'kappa']
+        self.index = TfidfIndex([
+            Counter({words[index % 8]: 2, words[(index * 3) % 8]: 1, words[(index + 5) % 8]: 1})
+            for index in range(40)
+        ])
+        self.rows = list(range(40))
+
+    def test_batches_are_bounded_by_postings(self):
+        expected = list(self.index.neighbours(self.rows, 3))
+        with mock.patch('apps.main.related.SCORE_CELLS', 60):
+            batches = list(self.index.batches(self.rows))
+            self.assertEqual(list(self.index.neighbours(self.rows, 3)), expected)
+
+        self.assertGreater(len(batches), 1)
+        self.assertEqual(sum(batches, []), self.rows)
+        for batch in batches:
+            self.assertTrue(len(batch) == 1 or self.index.row_postings[batch].sum() <= 60)
+
+
+class SearchHeadlineTests(TestCase):
+    def test_headline_escapes_post_content(self):
+        Post.objects.create(title='Vote', content='<img src=x onerror="alert(1)"> election & results',
+                            author=create_author())
+        response = APIClient().get('/api/v1/posts/', {'search': 'election'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data['results'][0]['search_headline'],
+            '&lt;img src=x onerror=&quot;alert(1)&quot;&gt; <b>election</b> &amp; results',
+        )
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = create_author()
+        for index in range(45):
+            Post.objects.create(title=f'Post {index}', content='body', author=self.author)
+        # A run of equal created_at values across the first page boundary
+        # is split by id.
+        tied = Post.objects.get(title='Post 22').created_at
+        Post.objects.filter(title__in=[f'Post {index}' for index in range(15, 31)]).update(created_at=tied)
+        self.client = APIClient()
+
+    def test_pages_are_stable_across_inserts(self):
+        expected = list(Post.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        url = '/api/v1/posts/?cursor='
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            seen += [post['id'] for post in response.data['results']]
+            if len(seen) == 20:
+                for index in range(5):
+                    Post.objects.create(title=f'Newer {index}', content='body', author=self.author)
+            url = response.data['next']
+
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/v1/posts/?cursor=bogus').status_code, 404)
+
+
+class PopularPostsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        author = create_author()
+        self.category = Category.objects.create(name='Tech')
+        self.posts = [
+            Post.objects.create(title=f'Post {views}', content='body', author=author,
+                                views_count=views, category=self.category if views % 2 else None)
+            for views in (5, 50, 1, 20)
+        ]
+        self.client = APIClient()
+
+    def titles(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [post['title'] for post in response.data]
+
+    def test_falls_back_to_views_before_first_refresh(self):
+        self.assertEqual(self.titles('/api/v1/posts/popular/'), ['Post 50', 'Post 20', 'Post 5', 'Post 1'])
+        self.assertEqual(self.titles('/api/v1/posts/popular/?category=tech&limit=1'), ['Post 5'])
+
+    def test_serves_trending_table_once_refreshed(self):
+        refresh_trending()
+        cache.clear()
+        self.assertEqual(self.titles('/api/v1/posts/popular/?limit=2'), ['Post 50', 'Post 20'])
+        self.assertEqual(self.titles('/api/v1/posts/popular/?category=nothing'), [])
+
+
+class ConditionalPostDetailTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(title='Cond', content='body', author=create_author())
+        self.url = f'/api/v1/posts/{self.post.slug}/'
+        self.client = APIClient()
+
+    def test_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_validators_change_after_edit(self):
+        response = self.client.get(self.url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        self.post.content = 'edited'
+        self.post.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        Post.objects.filter(pk=self.post.pk).update(updated_at=self.post.updated_at + timedelta(seconds=5))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+
+
+class FeedInvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = create_author()
+        self.client = APIClient()
+
+    def titles(self):
+        response = self.client.get('/api/v1/posts/feed/json/')
+        self.assertEqual(response.status_code, 200)
+        return [item['title'] for item in json.loads(response.content)['items']]
+
+    def test_feed_changes_once_the_write_commits(self):
+        self.assertEqual(self.titles(), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(title='Fresh', content='body', author=self.author)
+            # A poll before the commit keeps serving the old version.
+            self.assertEqual(self.titles(), [])
+        self.assertEqual(self.titles(), ['Fresh'])
+
+
+class SitemapInvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = create_author()
+        self.client = APIClient()
+
+    def sitemap(self):
+        response = self.client.get('/sitemap-posts-0.xml')
+        self.assertEqual(response.status_code, 200)
+        return response.getvalue()
+
+    def test_sitemap_changes_once_the_write_commits(self):
+        post = Post.objects.create(title='First', content='body', author=self.author)
+        self.assertIn(post.slug.encode(), self.sitemap())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(title='Second', content='body', author=self.author)
+            # A request before the commit keeps serving the cached chunk.
+            self.assertNotIn(b'/second/', self.sitemap())
+        self.assertIn(b'/second/', self.sitemap())
+
+
+@override_settings(IMAGE_VARIANTS_ASYNC=False, MEDIA_ROOT=tempfile.mkdtemp())
+class ImageVariantTests(TestCase):
+    def test_processed_variants_change_the_validators(self):
+        buffer = BytesIO()
+        Image.new('RGB', (40, 30), 'red').save(buffer, 'PNG')
+        image = SimpleUploadedFile('cover.png', buffer.getvalue(), content_type='image/png')
+        with self.captureOnCommitCallbacks() as callbacks:
+            post = Post.objects.create(title='Cover', content='body', author=create_author(), image=image)
+        url = f'/api/v1/posts/{post.slug}/'
+        client = APIClient()
+        response = client.get(url)
+        self.assertIsNone(response.data['image_variants'])
+
+        for callback in callbacks:
+            callback()
+        response = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['image_variants']), set(settings.IMAGE_VARIANTS))
+
+
+class AsyncPostDetailTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(title='Async', content='body', author=create_author())
+
+    def request(self, method):
+        request = getattr(AsyncRequestFactory(), method)(f'/api/v1/posts/{self.post.slug}/')
+        with mock.patch('apps.main.counters.arecord_view') as record:
+            response = async_to_sync(async_views.post_detail)(request, slug=self.post.slug)
+        self.assertEqual(response.status_code, 200)
+        return record.call_count
+
+    def test_only_get_counts_a_view(self):
+        self.assertEqual(self.request('head'), 0)
+        self.assertEqual(self.request('get'), 1)
+
+
+class SlugTests(TestCase):
+    def setUp(self):
+        self.author = create_author()
+
+    def create(self, title, **extra):
+        return Post.objects.create(title=title, content='body', author=self.author, **extra)
+
+    def test_collisions_get_the_next_suffix(self):
+        self.assertEqual(self.create('Hello World').slug, 'hello-world')
+        self.assertEqual(self.create('Hello World').slug, 'hello-world-2')
+        self.create('Hello World Again')
+        self.create('x', slug='hello-world-7')
+        self.assertEqual(self.create('Hello, World!').slug, 'hello-world-8')
+        self.assertEqual(allocate_slugs(['Hello World', 'New', 'New']), ['hello-world-9', 'new', 'new-2'])
+
+    def test_retitled_post_keeps_its_own_slug_out_of_the_count(self):
+        post = self.create('Hello World')
+        self.assertEqual(allocate_slug('Hello World', exclude_pk=post.pk), 'hello-world')
+
+    def test_retries_when_a_concurrent_insert_takes_the_slug(self):
+        def race(title, exclude_pk=None):
+            # Another request inserts the allocated slug before our INSERT.
+            allocate.side_effect = allocate_slug
+            self.create('Other', slug='race')
+            return 'race'
+
+        with mock.patch('apps.main.models.allocate_slug', side_effect=race) as allocate:
+            post = self.create('Race')
+
+        self.assertEqual(allocate.call_count, 2)
+        self.assertEqual(post.slug, 'race-2')
+        self.assertEqual(Post.objects.filter(slug__startswith='race').count(), 2)
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Tech')
+        Post.objects.create(title='Sparse', content='long body', author=create_author(), category=category)
+        self.client = APIClient()
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        return response, [query['sql'] for query in queries.captured_queries]
+
+    def test_fields_narrow_the_select(self):
+        response, queries = self.get('/api/v1/posts/', fields='id,title')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data['results'][0]), ['id', 'title'])
+        self.assertEqual(queries[-1].split(' FROM ')[0], 'SELECT "post"."id" AS "id", "post"."title" AS "title"')
+
+    def test_exclude_skips_the_posts_count(self):
+        response, queries = self.get('/api/v1/posts/categories/', exclude='posts_count')
+        self.assertNotIn('posts_count', response.data['results'][0])
+        self.assertFalse(any('"post"' in sql for sql in queries))
+
+    def test_fields_with_cursor(self):
+        author = Post.objects.get().author
+        for index in range(25):
+            Post.objects.create(title=f'Post {index}', content='body', author=author)
+        response = self.client.get('/api/v1/posts/', {'cursor': '', 'fields': 'title'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data['results'][0]), ['title'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 6)
+
+    def test_unknown_field(self):
+        self.assertEqual(self.client.get('/api/v1/posts/', {'fields': 'id,bogus'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/posts/categories/', {'exclude': 'bogus'}).status_code, 400)
+
+
+class ImportPostsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_author('writer')
+
+    def run_import(self, suffix, text, **options):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, encoding='utf-8') as handle:
+            handle.write(text)
+            handle.flush()
+            stdout, stderr = StringIO(), StringIO()
+            call_command('import_posts', handle.name, chunk_size=3, stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_malformed_jsonl_records_are_skipped(self):
+        records = [
+            {'title': 'Good', 'author': 'writer', 'views_count': 4, 'created_at': '2024-01-02T03:04:05'},
+            '{"title": "Broken", ',
+            {'title': 'Bad views', 'author': 'writer', 'views_count': 'many'},
+            {'title': 'Bad date', 'author': 'writer', 'created_at': 'yesterday'},
+            {'title': 'Unknown author', 'author': 'nobody'},
+            ['not', 'an', 'object'],
+            {'title': 'Also good', 'author': 'writer@example.com'},
+        ]
+        text = '\n'.join(record if isinstance(record, str) else json.dumps(record) for record in records)
+        stdout, stderr = self.run_import('.jsonl', text)
+
+        self.assertIn('Imported 2 posts, skipped 5', stdout)
+        self.assertEqual(sorted(Post.objects.values_list('title', flat=True)), ['Also good', 'Good'])
+        self.assertEqual(Post.objects.get(title='Good').views_count, 4)
+        self.assertEqual(Post.objects.get(title='Good').created_at.year, 2024)
+        for number in (2, 3, 4, 6):
+            self.assertIn(f'Skipped malformed record {number}:', stderr)
+
+    def test_malformed_csv_records_are_skipped(self):
+        text = 'title,author,views_count\nGood,writer,1\nBad,writer,-3\nWorse,writer,x\n'
+        stdout, stderr = self.run_import('.csv', text)
+
+        self.assertIn('Imported 1 posts, skipped 2', stdout)
+        self.assertIn('Skipped malformed record 2: negative views_count', stderr)
+
+    def test_category_names_sharing_a_slug(self):
+        Category.objects.create(name='Tech News')
+        text = 'title,author,category\nOne,writer,Tech-News\nTwo,writer,World!\nThree,writer,World?\nFour,writer,!!!\n'
+        stdout, stderr = self.run_import('.csv', text, create_categories=True)
+
+        self.assertIn('Imported 3 posts, skipped 1', stdout)
+        self.assertIn('Skipped malformed record 4:', stderr)
+        self.assertEqual(sorted(Category.objects.values_list('slug', flat=True)), ['tech-news', 'world'])
+        self.assertEqual(Post.objects.get(title='One').category.name, 'Tech News')
+        self.assertEqual(Post.objects.get(title='Three').category.name, 'World!')
@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.core.cache import bump_versions
+from .models import Post, TrendingPost
+
+
+def trending_score(views, comments, created_at, now):
+    # Hacker News style gravity: engagement divided by a power of age, so
+    # new posts can overtake old ones with larger lifetime counts.
+    age_hours = max((now - created_at).total_seconds() / 3600, 0)
+    engagement = views + comments * settings.TRENDING_COMMENT_WEIGHT
+    return engagement / (age_hours + 2) ** settings.TRENDING_GRAVITY
+
+
+def refresh_trending(now=None, batch_size=1000):
+    now = now or timezone.now()
+    since = now - timedelta(days=settings.TRENDING_WINDOW_DAYS)
+    candidates = Post.objects.filter(status='published', created_at__gte=since).values_list(
+        'pk', 'category_id', 'views_count', 'comments_count', 'created_at'
+    )
+
+    batch = []
+    refreshed = 0
+    with transaction.atomic():
+        for post_id, category_id, views, comments, created_at in candidates.iterator(chunk_size=batch_size):
+            batch.append(TrendingPost(
+                post_id=post_id,
+                category_id=category_id,
+                score=trending_score(views, comments, created_at, now),
+                refreshed_at=now,
+            ))
+            if len(batch) >= batch_size:
+                refreshed += _upsert(batch)
+                batch = []
+        if batch:
+            refreshed += _upsert(batch)
+
+        # Anything not touched in this pass left the window or was unpublished.
+        removed, _ = TrendingPost.objects.exclude(refreshed_at=now).delete()
+    bump_versions('posts')
+    return refreshed, removed
+
+
+def _upsert(batch):
+    TrendingPost.objects.bulk_create(
+        batch,
+        update_conflicts=True,
+        unique_fields=['post'],
+        update_fields=['category', 'score', 'refreshed_at'],
+    )
+    return len(batch)
+
+
+def top_posts(limit, category_slug=None):
+    queryset = TrendingPost.objects.filter(post__status='published').select_related(
+        'post__author', 'post__category'
+    ).defer('post__content', 'post__search_vector')
+    if category_slug:
+        queryset = queryset.filter(category__slug=category_slug)
+    posts = [trending.post for trending in queryset.order_by('-score')[:limit]]
+    if posts or TrendingPost.objects.exists():
+        return posts
+    # Until refresh_trending first runs (fresh deploy, restored database)
+    # rank by lifetime views rather than answering with nothing.
+    fallback = Post.objects.filter(status='published').for_list()
+    if category_slug:
+        fallback = fallback.filter(category__slug=category_slug)
+    return list(fallback.order_by('-views_count', '-created_at')[:limit])
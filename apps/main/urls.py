@@ -1,19 +1,33 @@
 from django.urls import path
 from . import views
 
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, feeds, views
+
+if settings.ASYNC_READ_VIEWS:
+    recent_posts = async_views.recent_posts
+    post_detail = async_views.post_detail
+else:
+    recent_posts = views.recent_posts
+    post_detail = views.PostDetailView.as_view()
 
 urlpatterns = [
     # Categories
     path('categories/', views.CategoryListCreateView.as_view(), name='category-list'),
     path('categories/<slug:slug>/', views.CategoryDetailView.as_view(), name='category-detail'),
     path('categories/<slug:category_slug>/posts/', views.post_by_category, name='posts-by-category'),
+    path('categories/<slug:category_slug>/feed/<str:kind>/', feeds.category_feed, name='category-feed'),
 
     # Posts
     path('', views.PostListCreateView.as_view(), name='post-list'),
     path('my-posts/', views.MyPostsView.as_view(), name='my-posts'),
+    path('my-posts/views/', views.my_posts_views, name='my-posts-views'),
     path('popular/', views.popular_posts, name='popular-posts'),
-    path('recent/', views.recent_posts, name='recent-posts'),
-    path('<slug:slug>/', views.PostDetailView.as_view(), name='post-detail'),
+    path('recent/', recent_posts, name='recent-posts'),
+    path('export/', views.export_posts, name='post-export'),
+    path('feed/<str:kind>/', feeds.site_feed, name='post-feed'),
+    path('<slug:slug>/related/', views.related_posts, name='related-posts'),
+    path('<slug:slug>/views/', views.post_views, name='post-views'),
+    path('<slug:slug>/', post_detail, name='post-detail'),
 ]
\ No newline at end of file
@@ -2,20 +2,35 @@ from rest_framework import generics, permissions, status, filters
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
 
+from apps.core.cache import CachedListMixin, cache_response
+from apps.core.conditional import ConditionalRetrieveMixin
+from apps.core.db import AtomicWritesMixin, atomic_writes
+from apps.core.export import export_response
+from apps.core.pagination import OptionalCursorPagination
+from apps.core.serializers import SparseQuerysetMixin, ValuesListMixin
+from .analytics import daily_views, parse_range, top_posts_by_views
 from .models import Category, Post
+from .related import related_posts as related_posts_for
+from .search import PostSearchFilter
+from .trending import top_posts
 from  .serializers import (
     CategorySerializer,
     PostListSerializer,
+    PostListValuesSerializer,
     PostDetailSerializer,
     PostCreateUpdateSerializer
 )
 
 from .permissions import IsAuthorOrReadOnly
 
-class CategoryListCreateView(generics.ListCreateAPIView):
+class CategoryListCreateView(AtomicWritesMixin, CachedListMixin, SparseQuerysetMixin, generics.ListCreateAPIView):
+    cache_groups = ('categories',)
+    # posts_count is annotated by CategorySerializer.narrow() when requested.
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
@@ -24,23 +39,25 @@ class CategoryListCreateView(generics.ListCreateAPIView):
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
 
-class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CategoryDetailView(AtomicWritesMixin, SparseQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     lookup_field = 'slug'
 
-class PostListCreateView(generics.ListCreateAPIView):
+class PostListCreateView(AtomicWritesMixin, ValuesListMixin, generics.ListCreateAPIView):
     serializer_class = PostListSerializer
+    values_serializer_class = PostListValuesSerializer
+    pagination_class = OptionalCursorPagination
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, PostSearchFilter]
     filterset_fields = ['category', 'author', 'status']
     search_fields = ['title', 'content']
     ordering_fields = ['created_at', 'updated_at', 'views_count', 'title']
     ordering = ['-created_at']
 
     def get_queryset(self):
-        queryset = Post.objects.select_related('author', 'category')
+        queryset = Post.objects.for_list()
         if not self.request.user.is_authenticated:
             queryset = queryset.filter(status = 'published')
         else:
@@ -54,31 +71,42 @@ class PostListCreateView(generics.ListCreateAPIView):
             return PostCreateUpdateSerializer
         return PostListSerializer
 
-class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Post.objects.select_related('author', 'category')
+class PostDetailView(AtomicWritesMixin, ConditionalRetrieveMixin, SparseQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Post.objects.select_related('author', 'category').defer('search_vector')
     serializer_class = PostDetailSerializer
     permission_classes = (IsAuthorOrReadOnly,)
     lookup_field = 'slug'
+    # Read by the validators and increment_views() whatever ?fields= says.
+    sparse_required_fields = ('updated_at', 'comments_count', 'views_count')
 
     def get_serializer_class(self):
         if self.request.method in ['PATCH', 'PUT']:
             return PostCreateUpdateSerializer
         return PostDetailSerializer
 
+    def get_etag_parts(self, instance):
+        return super().get_etag_parts(instance) + [instance.comments_count]
+
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
 
+        not_modified = self.get_not_modified_response(request, instance)
+        if not_modified is not None:
+            return not_modified
+
         if request.method == "GET":
             instance.increment_views()
 
         serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        return self.finalize_conditional_response(Response(serializer.data), instance)
 
 
-class MyPostsView(generics.ListAPIView):
+class MyPostsView(ValuesListMixin, generics.ListAPIView):
     serializer_class = PostListSerializer
+    values_serializer_class = PostListValuesSerializer
+    pagination_class = OptionalCursorPagination
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, PostSearchFilter]
     filterset_fields = ['category', 'status']
     search_fields = ['title', 'content']
     ordering_fields = ['created_at', 'updated_at', 'views_count', 'title']
@@ -87,39 +115,101 @@ class MyPostsView(generics.ListAPIView):
     def get_queryset(self):
         return Post.objects.filter(
             author = self.request.user,
-        ).select_related('author', 'category')
+        ).for_list()
 
+@atomic_writes
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@cache_response('posts', 'categories')
 def post_by_category(request, category_slug):
-    category = get_object_or_404(Category, slug=category_slug)
+    category = get_object_or_404(Category.objects.with_posts_count(), slug=category_slug)
     posts = Post.objects.filter(
         category=category,
         status='published',
-    ).select_related('author', 'category').order_by('-created_at')
+    ).order_by('-created_at')
 
-    serializer = PostListSerializer(posts, many=True, context={'request': request})
+    serializer = PostListValuesSerializer(context={'request': request})
     return Response ({
         'category': CategorySerializer(category).data,
-        'posts': serializer.data,
+        'posts': serializer.many(serializer.values(posts)),
     })
 
+@atomic_writes
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@cache_response('posts')
 def popular_posts(request):
-    posts = Post.objects.filter(
-        status='published',
-    ).select_related('author', 'category').order_by('-created_at')
+    try:
+        limit = int(request.query_params.get('limit', settings.TRENDING_DEFAULT_LIMIT))
+    except ValueError:
+        limit = settings.TRENDING_DEFAULT_LIMIT
+    limit = min(max(limit, 1), settings.TRENDING_MAX_LIMIT)
+    posts = top_posts(limit, category_slug=request.query_params.get('category'))
 
     serializer = PostListSerializer(posts, many=True, context={'request': request})
     return Response(serializer.data)
 
+@atomic_writes
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@cache_response('posts')
 def recent_posts(request):
     posts = Post.objects.filter(
         status='published',
-    ).select_related('author', 'category').order_by('-views_count')[:10]
+    ).order_by('-views_count')[:10]
 
-    serializer = PostListSerializer(posts, many=True, context={'request': request})
-    return Response(serializer.data)
+    serializer = PostListValuesSerializer(context={'request': request})
+    return Response(serializer.many(serializer.values(posts)))
+
+@atomic_writes
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+@cache_response('posts')
+def related_posts(request, slug):
+    post = get_object_or_404(Post.objects.only('id'), slug=slug, status='published')
+
+    serializer = PostListValuesSerializer(context={'request': request})
+    return Response(serializer.many(serializer.values(related_posts_for(post))))
+
+@atomic_writes
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def post_views(request, slug):
+    post = get_object_or_404(Post.objects.only('id', 'title', 'slug'), slug=slug, author=request.user)
+    start, end = parse_range(request.query_params)
+
+    data = daily_views([post.pk], start, end)
+    data['post'] = {
+        'id': post.id,
+        'title': post.title,
+        'slug': post.slug,
+    }
+    return Response(data)
+
+@atomic_writes
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def my_posts_views(request):
+    posts = Post.objects.filter(author=request.user).values('pk')
+    start, end = parse_range(request.query_params)
+
+    data = daily_views(posts, start, end)
+    data['top_posts'] = top_posts_by_views(posts, start, end)
+    return Response(data)
+
+EXPORT_FIELDS = (
+    'id', 'title', 'slug', 'content', 'excerpt', 'status',
+    'author__username', 'category__slug', 'views_count', 'comments_count',
+    'created_at', 'updated_at',
+)
+
+@transaction.non_atomic_requests
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def export_posts(request):
+    posts = Post.objects.all()
+    if request.query_params.get('status'):
+        posts = posts.filter(status=request.query_params['status'])
+    if request.query_params.get('category'):
+        posts = posts.filter(category__slug=request.query_params['category'])
+    return export_response(request, posts, EXPORT_FIELDS, 'posts')
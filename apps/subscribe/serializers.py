@@ -1,5 +1,7 @@
 from rest_framework import serializers
 from django.utils import timezone
+
+from apps.core.serializers import SparseFieldsMixin
 from .models import (
     SubscriptionPlan,
     Subscription,
@@ -7,7 +9,7 @@ from .models import (
     SubscriptionHistory
 )
 
-class SubscriptionPlanSerializer(serializers.ModelSerializer):
+class SubscriptionPlanSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = SubscriptionPlan
         fields = [
@@ -19,17 +21,22 @@ class SubscriptionPlanSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        if not data.get('features'):
+        if 'features' in self.fields and not data.get('features'):
             data['features'] = {}
 
         return data
 
 
-class SubscriptionSerializer(serializers.ModelSerializer):
+class SubscriptionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     plan_info = SubscriptionPlanSerializer(source='plan', read_only=True)
     user_info = serializers.SerializerMethodField()
     is_active = serializers.ReadOnlyField()
     days_remaining = serializers.ReadOnlyField()
+    field_dependencies = {
+        'user_info': ('user',),
+        'is_active': ('status', 'end_date'),
+        'days_remaining': ('status', 'end_date'),
+    }
 
     class Meta:
         model = Subscription
@@ -79,8 +86,9 @@ class SubscriptionCreateSerializer(serializers.ModelSerializer):
         validated_data['end_date'] = timezone.now()
         return super().create(validated_data)
 
-class PinnedPostSerializer(serializers.ModelSerializer):
+class PinnedPostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     post_info = serializers.SerializerMethodField()
+    field_dependencies = {'post_info': ('post',)}
 
     class Meta:
         model = PinnedPost
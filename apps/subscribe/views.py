@@ -5,6 +5,8 @@ from django.shortcuts import get_object_or_404
 from django.db import transaction
 from django.utils import timezone
 
+from apps.core.cache import CachedListMixin
+from apps.core.serializers import SparseQuerysetMixin
 from config.settings import AUTH_USER_MODEL
 from .models import SubscriptionPlan, Subscription, PinnedPost, SubscriptionHistory
 from .serializers import (
@@ -19,12 +21,13 @@ from .serializers import (
 )
 from apps.main.models import Post
 
-class SubscriptionPlanListView(generics.ListAPIView):
+class SubscriptionPlanListView(CachedListMixin, SparseQuerysetMixin, generics.ListAPIView):
+    cache_groups = ('plans',)
     queryset = SubscriptionPlan.objects.filter(is_active=True)
     serializer_class = SubscriptionPlanSerializer
     permission_classes = (permissions.AllowAny,)
 
-class SubscriptionPlanDetailView(generics.RetrieveAPIView):
+class SubscriptionPlanDetailView(SparseQuerysetMixin, generics.RetrieveAPIView):
     queryset = SubscriptionPlan.objects.filter(is_active=True)
     serializer_class = SubscriptionPlanSerializer
     permission_classes = (permissions.AllowAny,)
@@ -201,7 +204,7 @@ def pinned_posts_list(request):
         user__subscription__status='active',
         user__subscription__end_date__gt = timezone.now(),
         post__status='published'
-    ).order_by('pinned_at')
+    ).defer('post__content', 'post__search_vector').order_by('pinned_at')
 
     posts_data = []
     for pinned_post in pinned_posts:
@@ -210,7 +213,7 @@ def pinned_posts_list(request):
             'id': post.id,
             'title': post.title,
             'slug': post.slug,
-            'content': post.content[:200] + '...' if len(post.content) > 200 else post.content,
+            'content': post.excerpt,
             'image': post.image.url if post.image else None,
             'category': post.category.name if post.category else None,
             'author': {
@@ -5,11 +5,16 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from apps.main import sitemaps
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('sitemap.xml', sitemaps.sitemap_index, name='sitemap-index'),
+    path('sitemap-posts-<int:chunk>.xml', sitemaps.sitemap_posts, name='sitemap-posts'),
     path('api/v1/posts/', include('apps.main.urls')),
     path('api/v1/comments/', include('apps.comments.urls')),
     path('api/v1/auth/', include('apps.accounts.urls')),
+    path('api/v1/metrics/', include('apps.core.urls')),
 ]
 
 if settings.DEBUG: